@@ -1,14 +1,18 @@
-import pygame
 import math
+import sys
 from typing import List, Tuple
 
-# Initialize Pygame
-pygame.init()
+import numpy as np
 
-# Set up the display
+import init
+from frame_budget import FrameBudget
+from journal import Journal
+
+# pygame is imported where the cube is drawn, so Cube can be used without a display
+# and the window only opens in main()
+
+# Size of the display
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("3D Rubik's Cube with Rotations")
 
 # Define colors
 BLACK = (0, 0, 0)
@@ -19,126 +23,76 @@ BLUE = (0, 0, 255)
 ORANGE = (255, 165, 0)
 YELLOW = (255, 255, 0)
 
+# Colors of the init.py color ids
+STATE_COLORS = {
+    init.color_id["WHITE"]: WHITE,
+    init.color_id["RED"]: RED,
+    init.color_id["BLUE"]: BLUE,
+    init.color_id["GREEN"]: GREEN,
+    init.color_id["ORANGE"]: ORANGE,
+    init.color_id["YELLOW"]: YELLOW
+}
+
+# Sides of the init.py net by face number: Front, Right, Back, Left, Top, Bottom
+FACE_SIDES = ["FRONT", "RIGHT", "BACK", "LEFT", "UP", "DOWN"]
+
 # Define cube properties
 CUBE_SIZE = 300
-SQUARE_SIZE = CUBE_SIZE // 3
 
 class Square:
-    def __init__(self, face: int, row: int, col: int, color: Tuple[int, int, int]):
+    def __init__(self, face: int, index: int, position, normal, size: float):
         self.face = face
-        self.row = row
-        self.col = col
-        self.color = color
+        self.index = index  # Sticker index in the compact init.py state
+        self.corners = self._compute_corners(position, normal, size)
+
+    @staticmethod
+    def _compute_corners(position, normal, size: float) -> List[Tuple[float, float, float]]:
+        # The two axes in the plane of the sticker
+        u, v = [np.array(axis) for axis in np.eye(3, dtype=int) if not np.dot(axis, normal)]
+        center = (np.array(position) + 0.5 * np.array(normal)) * size
+        corners = [center + (du * u + dv * v) * size / 2 for du, dv in ((-1, -1), (1, -1), (1, 1), (-1, 1))]
+        # init.py has z pointing towards the viewer, the projection here has it pointing away
+        return [(x, y, -z) for x, y, z in corners]
 
     def get_corners(self) -> List[Tuple[float, float, float]]:
-        x, y, z = 0, 0, 0
-        offset = CUBE_SIZE / 3
-        if self.face == 0:  # Front
-            x, y, z = (self.col - 1) * SQUARE_SIZE, (self.row - 1) * SQUARE_SIZE, -offset
-        elif self.face == 1:  # Right
-            x, y, z = 2*offset, (self.row - 1) * SQUARE_SIZE, -(self.col - 1) * SQUARE_SIZE
-        elif self.face == 2:  # Back
-            x, y, z = -(self.col - 1) * SQUARE_SIZE, (self.row - 1) * SQUARE_SIZE, 2*offset
-        elif self.face == 3:  # Left
-            x, y, z = -offset, (self.row - 1) * SQUARE_SIZE, (self.col - 1) * SQUARE_SIZE
-        elif self.face == 4:  # Top
-            x, y, z = (self.col - 1) * SQUARE_SIZE, -offset, -(self.row - 1) * SQUARE_SIZE
-        elif self.face == 5:  # Bottom
-            x, y, z = (self.col - 1) * SQUARE_SIZE, 2*offset, (self.row - 1) * SQUARE_SIZE
-
-        corners = [
-            (x, y, z),
-            (x + SQUARE_SIZE, y, z),
-            (x + SQUARE_SIZE, y + SQUARE_SIZE, z),
-            (x, y + SQUARE_SIZE, z)
-        ]
-
-        if self.face in [1, 3]:  # Right and Left faces
-            corners = [
-                (x, y, z),
-                (x, y + SQUARE_SIZE, z),
-                (x, y + SQUARE_SIZE, z + SQUARE_SIZE),
-                (x, y, z + SQUARE_SIZE)
-            ]
-        elif self.face in [4, 5]:  # Top and Bottom faces
-            corners = [
-                (x, y, z),
-                (x + SQUARE_SIZE, y, z),
-                (x + SQUARE_SIZE, y, z + SQUARE_SIZE),
-                (x, y, z + SQUARE_SIZE)
-            ]
-
-        return corners
+        return self.corners
 
 class Cube:
-    def __init__(self):
+    def __init__(self, n: int = 3, journal_path: str = None):
+        self.n = n
+        self.turns = init.get_compact_turns(n)
+        # Move history for undo and redo, saved sessions continue from their last state
+        self.journal = Journal(journal_path, n)
+        if self.journal.n != n:
+            raise ValueError(f"The journal is for a {self.journal.n}x{self.journal.n}x{self.journal.n} cube")
+        self.state = self.journal.state
         self.squares = self._create_squares()
 
     def _create_squares(self) -> List[Square]:
         squares = []
-        colors = [BLUE, RED, GREEN, ORANGE, WHITE, YELLOW]
-        for face in range(6):
-            for row in range(3):
-                for col in range(3):
-                    squares.append(Square(face, row, col, colors[face]))
+        positions, normals = init.get_sticker_geometry(self.n)
+        for index, (position, normal) in enumerate(zip(positions, normals)):
+            face = FACE_SIDES.index(init.compact_sides[index // (self.n * self.n)])
+            squares.append(Square(face, index, position, normal, CUBE_SIZE / self.n))
         return squares
 
     def rotate_face(self, face: int, clockwise: bool):
-        # Rotate the squares on the face
-        face_squares = [s for s in self.squares if s.face == face]
-        new_positions = {}
-        for square in face_squares:
-            if clockwise:
-                new_row, new_col = square.col, 2 - square.row
-            else:
-                new_row, new_col = 2 - square.col, square.row
-            new_positions[square] = (new_row, new_col)
-        
-        for square, (new_row, new_col) in new_positions.items():
-            square.row, square.col = new_row, new_col
-
-        # Define adjacent faces and their affected rows/columns
-        adjacent_faces = {
-            0: [(4, 2, 1), (1, 1, 2), (5, 0, 2), (3, 1, 0)],  # Front / Blue
-            1: [(4, 1, 2), (2, 1, 0), (5, 1, 2), (0, 1, 2)],  # Right / Red
-            2: [(4, 0, 1), (3, 1, 2), (5, 2, 1), (1, 1, 0)],  # Back / Green
-            3: [(4, 1, 0), (0, 1, 0), (5, 1, 0), (2, 1, 2)],  # Left / Orange
-            4: [(2, 0, 1), (1, 0, 1), (0, 0, 1), (3, 0, 1)],  # Top / White
-            5: [(0, 2, 1), (1, 2, 1), (2, 2, 1), (3, 2, 1)]   # Bottom / Yellow
-        }
-
-        # Get the squares on the edges of adjacent faces
-        edge_squares = []
-        for adj_face, row, col in adjacent_faces[face]:
-            if row == 1:  # Vertical edge
-                edge_squares.append([s for s in self.squares if s.face == adj_face and s.col == col])
-            else:  # Horizontal edge
-                edge_squares.append([s for s in self.squares if s.face == adj_face and s.row == row])
-
-        # Rotate edge squares
-        if clockwise:
-            temp = edge_squares[0][:]
-            edge_squares[0][:] = edge_squares[3][::-1]
-            edge_squares[3][:] = edge_squares[2][:]
-            edge_squares[2][:] = edge_squares[1][::-1]
-            edge_squares[1][:] = temp
-        else:
-            temp = edge_squares[0][:]
-            edge_squares[0][:] = edge_squares[1][:]
-            edge_squares[1][:] = edge_squares[2][::-1]
-            edge_squares[2][:] = edge_squares[3][:]
-            edge_squares[3][:] = temp[::-1]
-
-        # Update the squares with their new positions
-        for i, edge in enumerate(edge_squares):
-            adj_face, row, col = adjacent_faces[face][i]
-            for j, square in enumerate(edge):
-                if row == 1:  # Vertical edge
-                    square.face, square.row, square.col = adj_face, j, col
-                else:  # Horizontal edge
-                    square.face, square.row, square.col = adj_face, row, j
-
-    def draw(self, screen: pygame.Surface, rotation_x: float, rotation_y: float):
+        # Moves are computed by the init.py state engine, the squares only hold geometry
+        moves = [FACE_SIDES[face]] * (1 if clockwise else 3)
+        self.state = init.apply_moves(self.state, moves, self.turns)
+        self.journal.record(FACE_SIDES[face], len(moves))
+
+    def undo(self):
+        if self.journal.undo():
+            self.state = self.journal.state
+
+    def redo(self):
+        if self.journal.redo():
+            self.state = self.journal.state
+
+    def draw(self, screen: "pygame.Surface", rotation_x: float, rotation_y: float, outlines: bool = True):
+        import pygame
+
         def rotate_point(x: float, y: float, z: float, rx: float, ry: float) -> Tuple[float, float, float]:
             # Rotate around Y-axis
             x, z = (x * math.cos(ry) - z * math.sin(ry),
@@ -174,16 +128,35 @@ class Cube:
                 rotated_corners = [rotate_point(*corner, rotation_x, rotation_y) for corner in corners]
                 projected_corners = [project(*corner) for corner in rotated_corners]
 
-                pygame.draw.polygon(screen, square.color, projected_corners)
-                pygame.draw.polygon(screen, BLACK, projected_corners, 1)
+                pygame.draw.polygon(screen, STATE_COLORS[self.state[square.index]], projected_corners)
+                if outlines:
+                    pygame.draw.polygon(screen, BLACK, projected_corners, 1)
+
+def draw_overlay(screen: "pygame.Surface", font: "pygame.font.Font", text: str):
+    screen.blit(font.render(text, True, WHITE), (10, 10))
+
+def main(n: int = 3, journal_path: str = None):
+    import pygame
 
-def main():
-    cube = Cube()
+    # Initialize Pygame and set up the display
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("3D Rubik's Cube with Rotations")
+
+    cube = Cube(n, journal_path)
     running = True
     clock = pygame.time.Clock()
-    rotation_x, rotation_y = math.pi / 6, -math.pi / 4  # Initial rotation for better view
+    rotation_x, rotation_y = -math.pi / 6, -math.pi / 4  # Initial rotation for better view
+    budget = FrameBudget()
+    font = pygame.font.Font(None, 24)
+    dirty = True  # Redraw needed
+    camera_moving = False
 
     while running:
+        if not dirty and not camera_moving:
+            # Nothing changed: sleep until the next event instead of redrawing
+            pygame.event.post(pygame.event.wait())
+
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
@@ -200,24 +173,46 @@ def main():
                     cube.rotate_face(4, True)  # Rotate top face clockwise
                 elif event.key == pygame.K_d:
                     cube.rotate_face(5, True)  # Rotate bottom face clockwise
+                elif event.key == pygame.K_z:
+                    cube.undo()  # Undo the last move
+                elif event.key == pygame.K_y:
+                    cube.redo()  # Redo the last undone move
+                elif event.key == pygame.K_q:
+                    budget.adaptive = not budget.adaptive  # Toggle adaptive quality
+                    budget.high_quality = True
+                dirty = True
+            elif event.type != pygame.MOUSEMOTION:
+                dirty = True  # Window exposed, resized, focused...
 
         keys = pygame.key.get_pressed()
         rotation_speed = 0.02
+        camera_moving = False
         if keys[pygame.K_LEFT]:
             rotation_y -= rotation_speed
+            camera_moving = True
         if keys[pygame.K_RIGHT]:
             rotation_y += rotation_speed
+            camera_moving = True
         if keys[pygame.K_UP]:
             rotation_x -= rotation_speed
+            camera_moving = True
         if keys[pygame.K_DOWN]:
             rotation_x += rotation_speed
-
-        screen.fill((30, 30, 30))
-        cube.draw(screen, rotation_x, rotation_y)
-        pygame.display.flip()
+            camera_moving = True
+
+        if dirty or camera_moving:
+            budget.start_frame()
+            screen.fill((30, 30, 30))
+            cube.draw(screen, rotation_x, rotation_y, outlines=budget.high_quality)
+            draw_overlay(screen, font, budget.overlay_text())
+            pygame.display.flip()
+            budget.end_frame()
+            dirty = False
         clock.tick(60)
 
+    cube.journal.close()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Optional cube size and journal file, e.g. "python 2d_squares.py 4 session.rjnl"
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3, sys.argv[2] if len(sys.argv) > 2 else None)
\ No newline at end of file
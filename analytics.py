@@ -0,0 +1,140 @@
+from functools import lru_cache
+
+import numpy as np
+
+import cubie
+import init
+
+# Analysis of move sequences through the single compact state permutation they
+# compose to: state_after = state[perm], as for the init turns.
+corner_names = ["URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB"]
+edge_names = ["UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB", "FR", "FL", "BL", "BR"]
+
+
+@lru_cache(maxsize=None)
+def get_turn_table(n=3):
+    # Permutations of every turn in 1, 2 and 3 clockwise quarter turns, row 0 is the identity.
+    # Returns the table and a dict (side, quarter turns) -> row.
+    turns = init.get_compact_turns(n)
+    table, rows = [np.arange(6 * n * n)], {}
+    for side, turn in turns.items():
+        perm = np.arange(6 * n * n)
+        for quarter_turns in range(1, 4):
+            perm = perm[turn]
+            rows[side, quarter_turns] = len(table)
+            table.append(perm)
+    return np.array(table), rows
+
+
+def compose(moves, n=3):
+    # One permutation for a move sequence such as "R U R' U'"
+    return compose_batch([moves], n)[0]
+
+
+def compose_batch(algorithms, n=3):
+    """Permutations of many move sequences at once, shape (N, 6n^2).
+
+    The sequences are padded with the identity and composed one move
+    column at a time for all of them together.
+    """
+    table, rows = get_turn_table(n)
+    parsed = [[rows[move] for move in init.parse_moves(moves)] for moves in algorithms]
+    length = max((len(moves) for moves in parsed), default=0)
+    moves = np.zeros((len(parsed), length), dtype=int)
+    for i, row in enumerate(parsed):
+        moves[i, :len(row)] = row
+    perms = np.broadcast_to(table[0], (len(parsed), table.shape[1]))
+    for column in moves.T:
+        perms = np.take_along_axis(perms, table[column], axis=1)
+    return np.array(perms)
+
+
+def cycle_lengths(perms):
+    # Length of the cycle of every sticker, for one permutation or a batch
+    perms = np.atleast_2d(perms)
+    identity = np.arange(perms.shape[1])
+    lengths = np.zeros(perms.shape, dtype=int)
+    power = perms
+    for k in range(1, perms.shape[1] + 1):
+        lengths[(power == identity) & (lengths == 0)] = k
+        if lengths.all():
+            break
+        power = np.take_along_axis(power, perms, axis=1)
+    return lengths
+
+
+def order(perms):
+    # Number of repetitions that bring the cube back to its state, the LCM of the cycle lengths
+    orders = np.lcm.reduce(cycle_lengths(perms), axis=1)
+    return orders if np.ndim(perms) == 2 else int(orders[0])
+
+
+def moved(perms):
+    # Mask of the stickers that change position
+    return np.asarray(perms) != np.arange(np.shape(perms)[-1])
+
+
+def cycles(perm):
+    # Sticker cycles of one permutation, each in the order the stickers travel
+    perm = np.asarray(perm)
+    inverse = np.argsort(perm)
+    seen = perm == np.arange(len(perm))
+    result = []
+    for start in range(len(perm)):
+        if seen[start]:
+            continue
+        cycle, i = [], start
+        while not seen[i]:
+            seen[i] = True
+            cycle.append(i)
+            i = inverse[i]
+        result.append(cycle)
+    return result
+
+
+def _piece_cycles(perm, orientation, modulus, names):
+    # Cycles of pieces as names in travel order, with the twist or flip one trip around adds
+    inverse = np.argsort(perm)
+    seen = np.zeros(len(perm), dtype=bool)
+    result = []
+    for start in range(len(perm)):
+        if seen[start] or (perm[start] == start and orientation[start] == 0):
+            continue
+        cycle, i = [], start
+        while not seen[i]:
+            seen[i] = True
+            cycle.append(i)
+            i = inverse[i]
+        result.append(([names[i] for i in cycle], int(orientation[cycle].sum() % modulus)))
+    return result
+
+
+def piece_cycles(perm):
+    # Corner and edge cycles of a 3x3x3 permutation, e.g. {"corners": [(["URF", "UFL", "ULB"], 0)], ...}
+    cp, co, ep, eo = cubie.from_faces(np.asarray(perm) // 9)
+    return {"corners": _piece_cycles(cp, co, 3, corner_names), "edges": _piece_cycles(ep, eo, 2, edge_names)}
+
+
+def affected_pieces(perms):
+    # Number of corners and edges that are moved or turned, for a batch of 3x3x3 permutations
+    cp, co, ep, eo = cubie.from_faces(np.atleast_2d(perms) // 9)
+    corners = ((cp != np.arange(8)) | (co != 0)).sum(axis=1)
+    edges = ((ep != np.arange(12)) | (eo != 0)).sum(axis=1)
+    return corners, edges
+
+
+def analyze(moves, n=3):
+    perm = compose(moves, n)
+    result = {"order": order(perm), "moved_stickers": int(moved(perm).sum()), "cycles": cycles(perm)}
+    if n == 3:
+        result.update(piece_cycles(perm))
+    return result
+
+
+def analyze_batch(algorithms, n=3):
+    # Order and moved sticker count of every sequence, plus moved pieces for the 3x3x3
+    perms = compose_batch(algorithms, n)
+    result = {"order": order(perms), "moved_stickers": moved(perms).sum(axis=1)}
+    if n == 3:
+        result["moved_corners"], result["moved_edges"] = affected_pieces(perms)
+    return result
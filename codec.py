@@ -0,0 +1,183 @@
+from math import factorial
+
+import numpy as np
+
+import cubie
+import init
+import validate
+
+# Binary formats for cube states.
+#  - cubie records: the co, eo, cp and ep coordinates of a valid 3x3x3 state and
+#    the orientation of its centers in 72 bits, stored as 9 bytes
+#  - sticker records: 3 bits per sticker of an n x n x n compact state, any colors 0..5
+N_EP = factorial(12)
+# ep has the parity of cp in valid states, so its rank is stored without its lowest bit
+CP_EP_BITS = 44  # cp * N_EP // 2 + ep // 2 < 2 ** 44
+LOW_CO_EO_BITS = 64 - CP_EP_BITS
+HIGH_CO_EO_BITS = 23 - LOW_CO_EO_BITS  # co * N_EO + eo < 2 ** 23, the upper 5 bits of high hold the orientation
+
+CUBIE_RECORD = np.dtype([("high", "u1"), ("low", "<u8")])
+
+
+def encode_cubies(cubes):
+    # Cubie records of a compact state, an init net or a batch of either, all valid
+    states = validate.to_states(cubes)
+    errors = validate.validate(states)
+    if errors.any():
+        index = int(np.flatnonzero(errors)[0])
+        raise ValueError(f"Invalid cube state at index {index}: {', '.join(validate.describe(errors[index]))}")
+    # Faces are relative to the centers of each state, the centers are stored as their orientation
+    orientation = (states[:, None, 4::9] == validate.get_center_layouts()).all(axis=-1).argmax(axis=1)
+    cp, co, ep, eo = cubie.from_stickers(states)
+    co_eo = (cubie.co_coord(co) * cubie.N_EO + cubie.eo_coord(eo)).astype(np.uint64)
+    cp_ep = (cubie.perm_rank(cp) * (N_EP // 2) + cubie.perm_rank(ep) // 2).astype(np.uint64)
+    records = np.empty(len(states), dtype=CUBIE_RECORD)
+    records["low"] = cp_ep | (co_eo << np.uint64(CP_EP_BITS))
+    records["high"] = (co_eo >> np.uint64(LOW_CO_EO_BITS)) | (orientation.astype(np.uint64) << np.uint64(HIGH_CO_EO_BITS))
+    return records
+
+
+def _rank_parity(ranks, k):
+    # Parity of the permutations of range(k) of lexicographic ranks: the sum of their digits
+    ranks = np.asarray(ranks, dtype=np.int64)
+    return sum(ranks // factorial(k - 1 - i) % (k - i) for i in range(k)) % 2
+
+
+def decode_cubies(records):
+    # Compact states in the init color scheme of cubie records, shape (N, 54)
+    records = np.asarray(records, dtype=CUBIE_RECORD).ravel()
+    low, high = records["low"], records["high"].astype(np.uint64)
+    cp_ep = (low & np.uint64((1 << CP_EP_BITS) - 1)).astype(np.int64)
+    co_eo = (((high & np.uint64((1 << HIGH_CO_EO_BITS) - 1)) << np.uint64(LOW_CO_EO_BITS))
+             | (low >> np.uint64(CP_EP_BITS))).astype(np.int64)
+    orientation = (high >> np.uint64(HIGH_CO_EO_BITS)).astype(np.int64)
+    co, eo = cubie.decode_co(co_eo // cubie.N_EO), cubie.decode_eo(co_eo % cubie.N_EO)
+    cp_rank, ep_rank = np.divmod(cp_ep, N_EP // 2)
+    # Of the two ep ranks 2k and 2k + 1, the one with the parity of cp
+    ep_rank = 2 * ep_rank
+    ep_rank += _rank_parity(ep_rank, 12) != _rank_parity(cp_rank, 8)
+    cp, ep = cubie.perm_unrank(cp_rank, 8), cubie.perm_unrank(ep_rank, 12)
+    layouts = validate.get_center_layouts()
+    faces = cubie.to_faces(cp, co, ep, eo)
+    return layouts[orientation[:, None], faces]
+
+
+def to_sticker_states(cubes, n=3):
+    # (N, 6n^2) compact states of a compact state, an init net or a batch of either, of size n
+    cubes = np.asarray(cubes)
+    if cubes.shape[-2:] == (3 * n, 4 * n):
+        return cubes.reshape(-1, 12 * n * n)[:, init.get_compact_idx(n)]
+    if cubes.shape[-1:] == (6 * n * n,):
+        return cubes.reshape(-1, 6 * n * n)
+    raise ValueError(f"Expected compact states or nets of size {n}, got shape {cubes.shape}")
+
+
+def pack_stickers(states):
+    # 3 bits per sticker of compact states of shape (N, 6n^2), colors 0..5
+    states = np.asarray(states)
+    if states.size and (states.min() < 0 or states.max() > 5):
+        raise ValueError(f"Sticker colors must be 0..5, got {states.min()}..{states.max()}")
+    states = states.astype(np.uint8)
+    states = states.reshape(-1, states.shape[-1])
+    bits = np.unpackbits(states[..., None], axis=-1)[..., 5:]
+    return np.packbits(bits.reshape(len(states), -1), axis=-1)
+
+
+def unpack_stickers(packed, n=3):
+    packed = np.asarray(packed, dtype=np.uint8).reshape(-1, sticker_record_size(n))
+    bits = np.unpackbits(packed, axis=-1, count=18 * n * n).reshape(len(packed), 6 * n * n, 3)
+    return (bits @ np.array([4, 2, 1], dtype=np.uint8)).astype(np.int64)
+
+
+def sticker_record_size(n=3):
+    return (18 * n * n + 7) // 8
+
+
+# ===========================
+# State files
+# ===========================
+
+# A 24 byte header followed by fixed size records, so record i starts at
+# HEADER.itemsize + i * record_size and files can be memory mapped.
+MAGIC = b"RCUB"
+VERSION = 2
+CUBIES, STICKERS = 0, 1
+HEADER = np.dtype([("magic", "S4"), ("version", "u1"), ("kind", "u1"), ("n", "u1"), ("reserved", "u1"),
+                   ("record_size", "<u4"), ("count", "<u8"), ("reserved2", "<u4")])
+
+
+def _record_dtype(kind, n):
+    return CUBIE_RECORD if kind == CUBIES else np.dtype((np.uint8, sticker_record_size(n)))
+
+
+def _encode(states, kind, n):
+    return encode_cubies(states) if kind == CUBIES else pack_stickers(states)
+
+
+def save(path, cubes, kind=CUBIES, n=3):
+    # Writes states to a new file, cubie records need valid 3x3x3 states
+    states = validate.to_states(cubes) if kind == CUBIES else to_sticker_states(cubes, n)
+    records = np.ascontiguousarray(_encode(states, kind, n))
+    header = np.zeros(1, dtype=HEADER)
+    header[0] = (MAGIC, VERSION, kind, n, 0, _record_dtype(kind, n).itemsize, len(records), 0)
+    with open(path, "wb") as f:
+        f.write(header.tobytes())
+        f.write(records.tobytes())
+
+
+def append(path, cubes):
+    # Adds states to the end of an existing file and updates its count
+    header = read_header(path)
+    kind, n = int(header["kind"][0]), int(header["n"][0])
+    states = validate.to_states(cubes) if kind == CUBIES else to_sticker_states(cubes, n)
+    records = np.ascontiguousarray(_encode(states, kind, n))
+    with open(path, "r+b") as f:
+        f.seek(HEADER.itemsize + int(header["count"][0]) * int(header["record_size"][0]))
+        f.write(records.tobytes())
+        header["count"] += len(records)
+        f.seek(0)
+        f.write(header.tobytes())
+
+
+def read_header(path):
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if len(header) == 0 or header["magic"][0] != MAGIC:
+        raise ValueError(f"{path} is no state file")
+    if header["version"][0] != VERSION:
+        raise ValueError(f"{path} has unsupported version {header['version'][0]}")
+    return header
+
+
+class StateFile:
+    """Memory mapped state file, indexing decodes only the records asked for.
+
+    file[i] is one compact state, file[a:b] or file[[i, j, ...]] a batch of
+    shape (N, 6n^2); records holds the raw records.
+    """
+
+    def __init__(self, path):
+        header = read_header(path)
+        self.kind, self.n = int(header["kind"][0]), int(header["n"][0])
+        count = int(header["count"][0])
+        if count:
+            self.records = np.memmap(path, dtype=_record_dtype(self.kind, self.n), mode="r",
+                                     offset=HEADER.itemsize, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=_record_dtype(self.kind, self.n))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        records = self.records[index]
+        single = np.ndim(index) == 0 and not isinstance(index, slice)
+        if self.kind == CUBIES:
+            states = decode_cubies(records)
+        else:
+            states = unpack_stickers(records, self.n)
+        return states[0] if single else states
+
+
+def load(path):
+    # All states of a file, shape (N, 6n^2)
+    return StateFile(path)[:]
@@ -0,0 +1,413 @@
+import os
+from functools import lru_cache
+from itertools import combinations, permutations
+from math import comb, factorial
+
+import numpy as np
+
+import init
+
+# Cubie level model of the 3x3x3 cube, built on the compact sticker state of init.
+# Faces are numbered in the order of init.compact_sides: U, R, F, D, L, B.
+U, R, F, D, L, B = range(6)
+
+# Stickers of each corner position, starting with the U or D sticker and going clockwise.
+# Corners are URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB.
+corner_facelets = np.array([
+    [8, 9, 20], [6, 18, 38], [0, 36, 47], [2, 45, 11],
+    [29, 26, 15], [27, 44, 24], [33, 53, 42], [35, 17, 51]
+])
+
+# Stickers of each edge position, starting with the U/D sticker (F/B for the middle layer).
+# Edges are UR, UF, UL, UB, DR, DF, DL, DB, FR, FL, BL, BR.
+edge_facelets = np.array([
+    [5, 10], [7, 19], [3, 37], [1, 46], [32, 16], [28, 25],
+    [30, 43], [34, 52], [23, 12], [21, 41], [50, 39], [48, 14]
+])
+
+corner_faces = corner_facelets // 9
+edge_faces = edge_facelets // 9
+
+# Moves in the half turn metric: "U", "U2", "U'", "R", ...
+face_names = "URFDLB"
+move_names = [face + suffix for face in face_names for suffix in ("", "2", "'")]
+opposite_face = {U: D, R: L, F: B, D: U, L: R, B: F}
+
+N_CO = 3 ** 7  # Corner orientation coordinate
+N_EO = 2 ** 11  # Edge orientation coordinate
+N_CP = factorial(8)  # Corner permutation coordinate
+
+# Two-phase coordinates. Phase 1 brings the cube into the group generated by
+# U, D, R2, L2, F2, B2, phase 2 solves it with those moves only.
+N_SLICE = comb(12, 4)  # Positions of the middle layer edges FR, FL, BL, BR
+N_UD_EDGE = factorial(8)  # Permutation of the U and D layer edges in phase 2
+N_SLICE_PERM = factorial(4)  # Permutation of the middle layer edges in phase 2
+phase2_moves = [move_names.index(name) for name in ("U", "U2", "U'", "R2", "F2", "D", "D2", "D'", "L2", "B2")]
+
+
+def _build_code_tables():
+    # Map the faces of a corner, read clockwise from the U/D sticker of its position,
+    # to the corner id and its twist
+    corner_code = np.full(6 ** 3, -1, dtype=np.int8)
+    corner_twist = np.zeros(6 ** 3, dtype=np.int8)
+    for corner, faces in enumerate(corner_faces):
+        for twist in range(3):
+            a, b, c = np.roll(faces, twist)
+            corner_code[(a * 6 + b) * 6 + c] = corner
+            corner_twist[(a * 6 + b) * 6 + c] = twist
+    # Map the faces of an edge to the edge id and its flip
+    edge_code = np.full(6 ** 2, -1, dtype=np.int8)
+    edge_flip = np.zeros(6 ** 2, dtype=np.int8)
+    for edge, (a, b) in enumerate(edge_faces):
+        edge_code[a * 6 + b], edge_code[b * 6 + a] = edge, edge
+        edge_flip[b * 6 + a] = 1
+    return corner_code, corner_twist, edge_code, edge_flip
+
+
+corner_code, corner_twist, edge_code, edge_flip = _build_code_tables()
+
+
+def sticker_faces(states):
+    # Face id of the color of every sticker, found through the colors of the centers.
+    # Colors that are no center color, or outside 0..5, give -1.
+    states = np.asarray(states)
+    # One row per state with a column per color, colors outside 0..5 share column 6
+    batch = states.reshape(-1, 54)
+    batch = np.where((batch >= 0) & (batch <= 5), batch, 6).astype(np.intp)
+    centers = batch[:, 4::9]
+    color_to_face = np.full((len(batch), 7), -1, dtype=np.int8)
+    rows = np.arange(len(batch))[:, None]
+    color_to_face[rows, centers] = np.arange(6)
+    color_to_face[:, 6] = -1  # Also when a center is outside 0..5
+    faces = color_to_face.ravel()[batch + rows * 7]
+    return faces.reshape(states.shape)
+
+
+def from_faces(faces):
+    # Cubie state (cp, co, ep, eo) of sticker face ids, for one state or a batch.
+    # cp[i] is the corner at position i and co[i] its clockwise twist, likewise for edges.
+    # Stickers that form no valid corner or edge give -1 in cp or ep.
+    faces = np.asarray(faces, dtype=np.int16)
+    cf = faces[..., corner_facelets]
+    code = (cf[..., 0] * 6 + cf[..., 1]) * 6 + cf[..., 2]
+    # Code 0 (three U stickers) is no corner, likewise for edges below
+    code = np.where((cf >= 0).all(axis=-1), code, 0)
+    cp, co = corner_code[code], corner_twist[code]
+
+    ef = faces[..., edge_facelets]
+    code = np.where((ef >= 0).all(axis=-1), ef[..., 0] * 6 + ef[..., 1], 0)
+    ep, eo = edge_code[code], edge_flip[code]
+    return cp, co, ep, eo
+
+
+def from_stickers(states):
+    return from_faces(sticker_faces(states))
+
+
+def to_faces(cp, co, ep, eo):
+    # Sticker face ids of a cubie state or a batch of them, the inverse of from_faces
+    cp, co, ep, eo = (np.asarray(a) for a in (cp, co, ep, eo))
+    faces = np.empty(cp.shape[:-1] + (54,), dtype=np.int8)
+    faces[..., 4::9] = np.arange(6)
+    facelets = corner_facelets[np.arange(8)[:, None], (np.arange(3) + co[..., None]) % 3]
+    np.put_along_axis(faces, facelets.reshape(cp.shape[:-1] + (24,)),
+                      corner_faces[cp].reshape(cp.shape[:-1] + (24,)), axis=-1)
+    facelets = edge_facelets[np.arange(12)[:, None], (np.arange(2) + eo[..., None]) % 2]
+    np.put_along_axis(faces, facelets.reshape(ep.shape[:-1] + (24,)),
+                      edge_faces[ep].reshape(ep.shape[:-1] + (24,)), axis=-1)
+    return faces
+
+
+def multiply(a, b):
+    # Cubie state a followed by the move (or state) b
+    cp_a, co_a, ep_a, eo_a = a
+    cp_b, co_b, ep_b, eo_b = b
+    return (cp_a[cp_b], (co_a[cp_b] + co_b) % 3, ep_a[ep_b], (eo_a[ep_b] + eo_b) % 2)
+
+
+@lru_cache(maxsize=None)
+def get_moves():
+    # Cubie state of each of the 18 moves, derived from the init turn permutations
+    turns = init.get_compact_turns(3)
+    moves = []
+    for side in init.compact_sides:
+        labels = np.arange(54)
+        for _ in range(3):
+            labels = init.make_turn(labels, side, turns)
+            moves.append(from_faces(labels // 9))
+    return moves
+
+
+def solved():
+    return np.arange(8), np.zeros(8, dtype=int), np.arange(12), np.zeros(12, dtype=int)
+
+
+# ===========================
+# Coordinates
+# ===========================
+
+def co_coord(co):
+    return np.asarray(co)[..., :7] @ 3 ** np.arange(6, -1, -1)
+
+
+def eo_coord(eo):
+    return np.asarray(eo)[..., :11] @ 2 ** np.arange(10, -1, -1)
+
+
+def perm_rank(perms):
+    # Rank of permutations in lexicographic order, for a batch along the first axis
+    perms = np.atleast_2d(perms)
+    k = perms.shape[-1]
+    later = np.triu(np.ones((k, k), dtype=bool), 1)
+    smaller_later = ((perms[..., :, None] > perms[..., None, :]) & later).sum(axis=-1)
+    weights = np.array([factorial(k - 1 - i) for i in range(k)])
+    return smaller_later @ weights
+
+
+def slice_coord(ep):
+    # Rank of the set of positions of the middle layer edges, 0 when they are in the middle layer
+    in_slice = np.asarray(ep) >= 8
+    count = np.cumsum(in_slice, axis=-1)
+    ranks = np.array([[comb(p, k) for k in range(5)] for p in range(12)])
+    return N_SLICE - 1 - (in_slice * ranks[np.arange(12), count]).sum(axis=-1)
+
+
+def perm_unrank(ranks, k):
+    # Permutations of range(k) of lexicographic ranks, the inverse of perm_rank
+    ranks = np.array(ranks, dtype=np.int64, ndmin=1)
+    unused = np.ones((len(ranks), k), dtype=bool)
+    perms = np.empty((len(ranks), k), dtype=np.int8)
+    for i in range(k):
+        digit, ranks = np.divmod(ranks, factorial(k - 1 - i))
+        # The digit-th smallest element that is still unused
+        perms[:, i] = np.argmax(np.cumsum(unused, axis=1) > digit[:, None], axis=1)
+        unused[np.arange(len(ranks)), perms[:, i]] = False
+    return perms
+
+
+def decode_co(coords):
+    digits = (coords[:, None] // 3 ** np.arange(6, -1, -1)) % 3
+    return np.hstack([digits, (-digits.sum(axis=1, keepdims=True)) % 3])
+
+
+def decode_eo(coords):
+    digits = (coords[:, None] // 2 ** np.arange(10, -1, -1)) % 2
+    return np.hstack([digits, digits.sum(axis=1, keepdims=True) % 2])
+
+
+# ===========================
+# Tables
+# ===========================
+
+# Tables are kept here as .npy files, so a process only builds them once per checkout
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+# Raised when the layout of a cached table changes
+TABLE_VERSION = 1
+
+
+@lru_cache(maxsize=None)
+def _cache_suffix():
+    # Tables built with other move conventions or layouts get other file names
+    import hashlib  # Imported here, as it costs CLI cold starts a few ms
+
+    digest = hashlib.sha1(np.concatenate([np.ravel(a) for move in get_moves() for a in move]).astype(np.int8).tobytes())
+    return f"v{TABLE_VERSION}-{digest.hexdigest()[:12]}"
+
+
+def _cached_tables(names, build):
+    # Loads the arrays CACHE_DIR/name-<suffix>.npy of names, or builds all of them and saves them there
+    paths = [os.path.join(CACHE_DIR, f"{name}-{_cache_suffix()}.npy") for name in names]
+    if all(os.path.exists(path) for path in paths):
+        return tuple(np.load(path) for path in paths)
+    import tempfile  # Only needed when building, it costs cold starts a few ms
+
+    arrays = build()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for path, array in zip(paths, arrays):
+        # Written to a file of its own first, so an interrupted build leaves no broken file
+        # and processes that build at the same time do not replace each other's files
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=CACHE_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return arrays
+
+
+def _cached(name, build):
+    return _cached_tables([name], lambda: [build()])[0]
+
+
+@lru_cache(maxsize=None)
+def get_move_tables():
+    # New coordinate after each move, tables of shape (coordinates, 18)
+    return _cached_tables(["co_move", "eo_move", "cp_move"], _build_move_tables)
+
+
+def _build_move_tables():
+    moves = get_moves()
+    co = decode_co(np.arange(N_CO))
+    eo = decode_eo(np.arange(N_EO))
+    cp = np.array(list(permutations(range(8))))
+    co_move = np.empty((N_CO, 18), dtype=np.int32)
+    eo_move = np.empty((N_EO, 18), dtype=np.int32)
+    cp_move = np.empty((N_CP, 18), dtype=np.int32)
+    for m, (cp_m, co_m, ep_m, eo_m) in enumerate(moves):
+        new_co = (co[:, cp_m] + co_m) % 3
+        co_move[:, m] = new_co[:, :7] @ 3 ** np.arange(6, -1, -1)
+        new_eo = (eo[:, ep_m] + eo_m) % 2
+        eo_move[:, m] = new_eo[:, :11] @ 2 ** np.arange(10, -1, -1)
+        cp_move[:, m] = perm_rank(cp[:, cp_m])
+    return co_move, eo_move, cp_move
+
+
+def _build_pruning_table(size, neighbours, chunk=1 << 18, start=0):
+    # Breadth first search from the solved coordinate start, the table holds the distance
+    table = np.full(size, 255, dtype=np.uint8)
+    table[start] = 0
+    depth = 0
+    frontier = np.array([start])
+    while frontier.size:
+        depth += 1
+        for start in range(0, frontier.size, chunk):
+            reached = neighbours(frontier[start:start + chunk]).ravel()
+            table[reached[table[reached] == 255]] = depth
+        frontier = np.flatnonzero(table == depth)
+    return table
+
+
+@lru_cache(maxsize=None)
+def get_phase1_tables():
+    # Middle layer edge move table of shape (N_SLICE, 18), and the distance to the
+    # phase 2 group of co * N_SLICE + slice and of eo * N_SLICE + slice
+    return _cached_tables(["slice_move", "co_slice", "eo_slice"], _build_phase1_tables)
+
+
+def _build_phase1_tables():
+    co_move, eo_move, _ = get_move_tables()
+    eps = np.zeros((N_SLICE, 12), dtype=int)
+    for positions in combinations(range(12), 4):
+        ep = np.array([p for p in range(12) if p not in positions] + list(positions))
+        eps[slice_coord(np.argsort(ep))] = np.argsort(ep)
+    slice_move = np.empty((N_SLICE, 18), dtype=np.int32)
+    for m, (_, _, ep_m, _) in enumerate(get_moves()):
+        slice_move[:, m] = slice_coord(eps[:, ep_m])
+    co_slice = _build_pruning_table(
+        N_CO * N_SLICE, lambda idx: co_move[idx // N_SLICE] * N_SLICE + slice_move[idx % N_SLICE])
+    eo_slice = _build_pruning_table(
+        N_EO * N_SLICE, lambda idx: eo_move[idx // N_SLICE] * N_SLICE + slice_move[idx % N_SLICE])
+    return slice_move, co_slice, eo_slice
+
+
+@lru_cache(maxsize=None)
+def get_phase2_tables():
+    # Move tables of shape (coordinates, 10) for the phase 2 moves, and the distance to
+    # solved of cp * N_SLICE_PERM + slice_perm and of ud_edge * N_SLICE_PERM + slice_perm
+    return _cached_tables(["phase2_cp_move", "ud_edge_move", "slice_perm_move", "cp_slice", "ud_slice"],
+                          _build_phase2_tables)
+
+
+def _build_phase2_tables():
+    _, _, cp_move = get_move_tables()
+    moves = [get_moves()[m] for m in phase2_moves]
+    ud_edges = np.array(list(permutations(range(8))))
+    slice_perms = np.array(list(permutations(range(4))))
+    ud_edge_move = np.empty((N_UD_EDGE, 10), dtype=np.int32)
+    slice_perm_move = np.empty((N_SLICE_PERM, 10), dtype=np.int32)
+    for m, (_, _, ep_m, _) in enumerate(moves):
+        ud_edge_move[:, m] = perm_rank(ud_edges[:, ep_m[:8]])
+        slice_perm_move[:, m] = perm_rank(slice_perms[:, ep_m[8:] - 8])
+    cp_move = np.ascontiguousarray(cp_move[:, phase2_moves])
+    cp_slice = _build_pruning_table(
+        N_CP * N_SLICE_PERM,
+        lambda idx: cp_move[idx // N_SLICE_PERM] * N_SLICE_PERM + slice_perm_move[idx % N_SLICE_PERM])
+    ud_slice = _build_pruning_table(
+        N_UD_EDGE * N_SLICE_PERM,
+        lambda idx: ud_edge_move[idx // N_SLICE_PERM] * N_SLICE_PERM + slice_perm_move[idx % N_SLICE_PERM])
+    return cp_move, ud_edge_move, slice_perm_move, cp_slice, ud_slice
+
+
+# ===========================
+# Korf pattern databases
+# ===========================
+
+# The optimal solver bounds the solution length by the exact distance of the
+# corners and of two sets of six edges (Korf 1997). An edge set is tracked by
+# the positions of its pieces, ranked as a partial permutation of the 12
+# positions, and their flips as 6 bits: coordinate = rank * 64 + flips.
+EDGE_SETS = ((0, 1, 2, 3, 4, 5), (6, 7, 8, 9, 10, 11))
+N_EDGE_SET_PERM = 12 * 11 * 10 * 9 * 8 * 7
+N_EDGE_SET = N_EDGE_SET_PERM * 64
+N_CORNERS = N_CP * N_CO  # cp * N_CO + co
+
+def _edge_set_rank(positions):
+    # Rank of the rows of positions, shape (N, 6), as partial permutations of range(12)
+    positions = np.atleast_2d(positions)
+    ranks = np.zeros(len(positions), dtype=np.int64)
+    for k in range(6):
+        smaller_earlier = (positions[:, :k] < positions[:, k:k + 1]).sum(axis=1)
+        ranks = ranks * (12 - k) + positions[:, k] - smaller_earlier
+    return ranks
+
+
+def _edge_set_unrank(ranks):
+    ranks = np.array(ranks, dtype=np.int64, ndmin=1)
+    digits = np.empty((len(ranks), 6), dtype=np.int64)
+    for k in range(5, -1, -1):
+        ranks, digits[:, k] = np.divmod(ranks, 12 - k)
+    unused = np.ones((len(digits), 12), dtype=bool)
+    positions = np.empty((len(digits), 6), dtype=np.int8)
+    for k in range(6):
+        positions[:, k] = np.argmax(np.cumsum(unused, axis=1) > digits[:, k:k + 1], axis=1)
+        unused[np.arange(len(digits)), positions[:, k]] = False
+    return positions
+
+
+def edge_set_coord(ep, eo, pieces):
+    # Coordinate of the edges pieces (one of EDGE_SETS) of cubie states, batched along the first axis
+    ep, eo = np.atleast_2d(ep), np.atleast_2d(eo)
+    positions = np.argsort(ep, axis=1)[:, list(pieces)]
+    flips = np.take_along_axis(eo, positions, axis=1)
+    return _edge_set_rank(positions) * 64 + flips @ (1 << np.arange(6))
+
+
+@lru_cache(maxsize=None)
+def get_edge_set_move_table():
+    """Edge set coordinate after each move, shape (N_EDGE_SET_PERM, 18).
+
+    Entries are new rank * 64 + the flips the move adds to the six pieces,
+    which depend only on their positions. So the coordinate c becomes
+    table[c >> 6, move] ^ (c & 63).
+    """
+    def build():
+        positions = _edge_set_unrank(np.arange(N_EDGE_SET_PERM))
+        table = np.empty((N_EDGE_SET_PERM, 18), dtype=np.int32)
+        for m, (_, _, ep_m, eo_m) in enumerate(get_moves()):
+            # The piece at position j goes to position destination[j]
+            destination = np.argsort(ep_m)[positions]
+            table[:, m] = _edge_set_rank(destination) * 64 + eo_m[destination] @ (1 << np.arange(6))
+        return table
+    return _cached("edge_set_move", build)
+
+
+def get_korf_tables():
+    """Distance to solved of the corners and of each of the EDGE_SETS.
+
+    The corner table is indexed by cp * N_CO + co (88M entries), the edge
+    tables by edge_set_coord (42.6M entries each). The first call builds
+    them in about half a minute and saves them to CACHE_DIR, later calls load them.
+    The 170 MB are not kept in memory here, callers hold on to what they need.
+    """
+    co_move, _, cp_move = get_move_tables()
+    corners = _cached("korf_corners", lambda: _build_pruning_table(
+        N_CORNERS, lambda idx: cp_move[idx // N_CO] * N_CO + co_move[idx % N_CO], chunk=1 << 16))
+    edge_move = get_edge_set_move_table()
+    cp, co, ep, eo = solved()
+    edges = [_cached(f"korf_edges_{i}", lambda pieces=pieces: _build_pruning_table(
+        N_EDGE_SET, lambda idx: edge_move[idx >> 6] ^ (idx & 63)[:, None],
+        chunk=1 << 16, start=int(edge_set_coord(ep, eo, pieces)[0])))
+        for i, pieces in enumerate(EDGE_SETS)]
+    return corners, edges[0], edges[1]
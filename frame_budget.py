@@ -0,0 +1,59 @@
+import time
+from collections import deque
+
+# Frame time budget for 60 FPS, in milliseconds
+DEFAULT_BUDGET_MS = 1000 / 60
+
+
+class FrameBudget:
+    """Measures real frame times of a render loop and picks the render quality.
+
+    Quality drops when the average frame time exceeds the budget and comes
+    back once frames take less than half of it, so it does not flicker
+    between the two modes.
+    """
+
+    def __init__(self, budget_ms: float = DEFAULT_BUDGET_MS, window: int = 60, adaptive: bool = True):
+        self.budget_ms = budget_ms
+        self.adaptive = adaptive
+        self.high_quality = True
+        self.frame_times = deque(maxlen=window)  # Render time of each frame in ms
+        self.frame_ends = deque(maxlen=window)  # perf_counter() at the end of each frame
+        self._frame_start = None
+        self._overlay_text = ""
+        self._overlay_updated = 0.0
+
+    def start_frame(self):
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self.frame_times.append((now - self._frame_start) * 1000)
+        self.frame_ends.append(now)
+        if self.adaptive and len(self.frame_times) == self.frame_times.maxlen:
+            if self.frame_time_ms > self.budget_ms:
+                self.high_quality = False
+            elif self.frame_time_ms < self.budget_ms / 2:
+                self.high_quality = True
+
+    @property
+    def frame_time_ms(self) -> float:
+        if not self.frame_times:
+            return 0.0
+        return sum(self.frame_times) / len(self.frame_times)
+
+    @property
+    def fps(self) -> float:
+        # Frames actually drawn per second, idle time without redraws counts as well
+        if len(self.frame_ends) < 2:
+            return 0.0
+        return (len(self.frame_ends) - 1) / (self.frame_ends[-1] - self.frame_ends[0])
+
+    def overlay_text(self, interval: float = 0.25) -> str:
+        # Refreshed a few times per second so the overlay stays readable
+        now = time.perf_counter()
+        if now - self._overlay_updated >= interval:
+            quality = "" if self.high_quality else "  low quality"
+            self._overlay_text = f"{self.fps:.0f} FPS  {self.frame_time_ms:.1f} ms{quality}"
+            self._overlay_updated = now
+        return self._overlay_text
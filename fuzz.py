@@ -0,0 +1,213 @@
+import sys
+import time
+
+import numpy as np
+
+import analytics
+import cubie
+import init
+
+# Differential fuzzing of the move engines. Random move sequences run through
+# every engine and the resulting compact states must agree with the reference,
+# which is init.apply_moves on the compact state as used by the visualizers.
+# Failing sequences are shrunk to minimal ones and every engine reports its
+# throughput, so the harness doubles as a benchmark for new fast paths.
+# The compact, turn table and cubie engines all use the turns of init and the
+# geometric one the same sticker geometry, so they can share a wrong turn. The
+# literal engine is independent of both: its face turns are typed in as cubie
+# tables, only its conversion to stickers goes through cubie.to_faces.
+REFERENCE = "compact"
+
+
+def _sides(sequence):
+    # A sequence of (side, quarter turns) as repeated turn names for init.apply_moves
+    return [side for side, quarter_turns in sequence for _ in range(quarter_turns)]
+
+
+def _run_compact(sequences, n):
+    turns = init.get_compact_turns(n)
+    start = init.to_compact(init.get_cube(n))
+    return np.array([init.apply_moves(start, _sides(sequence), turns) for sequence in sequences])
+
+
+def _run_net(sequences, n):
+    # The original net engine with the moves.yml permutations
+    turns = init.get_turns_list()
+    return np.array([init.to_compact(init.apply_moves(init.get_cube(), _sides(sequence), turns)) for sequence in sequences])
+
+
+def _run_turn_table(sequences, n):
+    # Whole batch at once through the composed permutations of analytics
+    perms = analytics.compose_batch([_sides(sequence) for sequence in sequences], n)
+    return init.to_compact(init.get_cube(n))[perms]
+
+
+def _rotation(axis, quarter_turns):
+    # Clockwise quarter turns seen from the end of axis, by Rodrigues' formula
+    axis = np.array(axis)
+    angle = -quarter_turns * np.pi / 2
+    cross = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    matrix = np.cos(angle) * np.eye(3) + np.sin(angle) * cross + (1 - np.cos(angle)) * np.outer(axis, axis)
+    return np.rint(matrix).astype(int)
+
+
+def _run_geometric(sequences, n):
+    # Stickers as points that are rotated with their layer, independent of the turn permutations
+    positions, normals = init.get_sticker_geometry(n)
+    positions = np.rint(2 * positions).astype(int)  # Doubled, so even n stays integer
+    sticker_at = {(tuple(p), tuple(m)): index for index, (p, m) in enumerate(zip(positions, normals))}
+    colors = init.to_compact(init.get_cube(n))
+    states = np.empty((len(sequences), len(colors)), dtype=colors.dtype)
+    for i, sequence in enumerate(sequences):
+        p, m = positions.copy(), normals.copy()
+        for side, quarter_turns in sequence:
+            side, _, depth = side.partition("_")
+            axis = init.side_frames[side][0]
+            layer = p @ axis == n - 1 - 2 * int(depth or 0)
+            rotation = _rotation(axis, quarter_turns)
+            p[layer], m[layer] = p[layer] @ rotation.T, m[layer] @ rotation.T
+        states[i, [sticker_at[(tuple(a), tuple(b))] for a, b in zip(p, m)]] = colors
+    return states
+
+
+def _run_cubie(sequences, n):
+    moves = dict(zip(cubie.move_names, cubie.get_moves()))
+    centers = init.to_compact(init.get_cube())[4::9]
+    states = []
+    for sequence in sequences:
+        state = cubie.solved()
+        for move in init.format_moves(sequence).split():
+            state = cubie.multiply(state, moves[move])
+        states.append(centers[cubie.to_faces(*state)])
+    return np.array(states)
+
+
+# Clockwise face turns in the cubie conventions of Kociemba, written out by hand:
+# (cp, co, ep, eo) with the piece that moves to each position and its added twist or flip
+LITERAL_MOVES = {
+    "U": ([3, 0, 1, 2, 4, 5, 6, 7], [0, 0, 0, 0, 0, 0, 0, 0],
+          [3, 0, 1, 2, 4, 5, 6, 7, 8, 9, 10, 11], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
+    "R": ([4, 1, 2, 0, 7, 5, 6, 3], [2, 0, 0, 1, 1, 0, 0, 2],
+          [8, 1, 2, 3, 11, 5, 6, 7, 4, 9, 10, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
+    "F": ([1, 5, 2, 3, 0, 4, 6, 7], [1, 2, 0, 0, 2, 1, 0, 0],
+          [0, 9, 2, 3, 4, 8, 6, 7, 1, 5, 10, 11], [0, 1, 0, 0, 0, 1, 0, 0, 1, 1, 0, 0]),
+    "D": ([0, 1, 2, 3, 5, 6, 7, 4], [0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 1, 2, 3, 5, 6, 7, 4, 8, 9, 10, 11], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
+    "L": ([0, 2, 6, 3, 4, 1, 5, 7], [0, 1, 2, 0, 0, 2, 1, 0],
+          [0, 1, 10, 3, 4, 5, 9, 7, 8, 2, 6, 11], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
+    "B": ([0, 1, 3, 7, 4, 5, 2, 6], [0, 0, 1, 2, 0, 0, 2, 1],
+          [0, 1, 2, 11, 4, 5, 6, 10, 8, 9, 3, 7], [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1]),
+}
+
+
+def _run_literal(sequences, n):
+    # Plain lists and the hand-written turns, no move code shared with the other engines
+    letters = {side: letter for letter, side in init.face_letters.items()}
+    centers = init.to_compact(init.get_cube())[4::9]
+    states = []
+    for sequence in sequences:
+        cp, co, ep, eo = list(range(8)), [0] * 8, list(range(12)), [0] * 12
+        for side, quarter_turns in sequence:
+            move_cp, move_co, move_ep, move_eo = LITERAL_MOVES[letters[side]]
+            for _ in range(quarter_turns):
+                cp, co = [cp[i] for i in move_cp], [(co[i] + twist) % 3 for i, twist in zip(move_cp, move_co)]
+                ep, eo = [ep[i] for i in move_ep], [(eo[i] + flip) % 2 for i, flip in zip(move_ep, move_eo)]
+        states.append(centers[cubie.to_faces(np.array(cp), np.array(co), np.array(ep), np.array(eo))])
+    return np.array(states)
+
+
+# name -> (engine, whether it handles any n and inner layers). An engine maps
+# a list of sequences to their compact states, shape (N, 6n^2).
+ENGINES = {
+    "compact": (_run_compact, True),
+    "net": (_run_net, False),
+    "turn_table": (_run_turn_table, True),
+    "geometric": (_run_geometric, True),
+    "cubie": (_run_cubie, False),
+    "literal": (_run_literal, False),
+}
+
+
+def random_sequences(count, length, n=3, inner=False, seed=None):
+    # Random sequences of (side, quarter turns), inner layer turns only when inner is set
+    rng = np.random.default_rng(seed)
+    sides = [side for side in init.get_compact_turns(n) if inner or "_" not in side]
+    picks = rng.integers(len(sides), size=(count, length))
+    quarter_turns = rng.integers(1, 4, size=(count, length))
+    return [[(sides[s], int(q)) for s, q in zip(row, turns)] for row, turns in zip(picks, quarter_turns)]
+
+
+def _differs(engine, sequence, n):
+    run = ENGINES[engine][0]
+    return bool((run([sequence], n) != ENGINES[REFERENCE][0]([sequence], n)).any())
+
+
+def shrink(engine, sequence, n=3):
+    """Minimal sub-sequence on which engine still disagrees with the reference.
+
+    Removes chunks of halving size while the failure persists, then
+    lowers the quarter turns of the remaining moves.
+    """
+    sequence = list(sequence)
+    chunk = max(len(sequence) // 2, 1)
+    while True:
+        i = 0
+        while i < len(sequence):
+            candidate = sequence[:i] + sequence[i + chunk:]
+            if _differs(engine, candidate, n):
+                sequence = candidate
+            else:
+                i += chunk
+        if chunk == 1:
+            break
+        chunk //= 2
+    for i, (side, quarter_turns) in enumerate(sequence):
+        for lower in range(1, quarter_turns):
+            candidate = sequence[:i] + [(side, lower)] + sequence[i + 1:]
+            if _differs(engine, candidate, n):
+                sequence = candidate
+                break
+    return sequence
+
+
+def fuzz(n=3, count=1000, length=25, inner=None, engines=None, seed=None, max_shrinks=3):
+    """Runs count random sequences through the engines and compares them to the reference.
+
+    inner defaults to True for n > 3; the net, cubie and literal engines
+    only run on 3x3x3 outer layer sequences. Returns a dict with the states per
+    second of every engine and the failures as (engine, shrunk moves).
+    """
+    inner = n > 3 if inner is None else inner
+    engines = [name for name in (engines or ENGINES) if name != REFERENCE
+               and (ENGINES[name][1] or (n == 3 and not inner))]
+    sequences = random_sequences(count, length, n, inner, seed)
+    throughput, failures = {}, []
+    reference = None
+    for name in [REFERENCE] + engines:
+        start = time.perf_counter()
+        states = ENGINES[name][0](sequences, n)
+        throughput[name] = count / (time.perf_counter() - start)
+        if reference is None:
+            reference = states
+            continue
+        for index in np.flatnonzero((states != reference).any(axis=1))[:max_shrinks]:
+            failures.append((name, init.format_moves(shrink(name, sequences[index], n))))
+    return {"n": n, "count": count, "length": length, "throughput": throughput, "failures": failures}
+
+
+def main(n=3, count=1000, length=25):
+    report = fuzz(n, count, length)
+    print(f"{count} random sequences of {length} moves on the {n}x{n}x{n}")
+    for name, rate in report["throughput"].items():
+        print(f"  {name:<12} {rate:12.0f} states/s  {rate * length:12.0f} moves/s")
+    for name, moves in report["failures"]:
+        print(f"  MISMATCH {name}: {moves}")
+    if not report["failures"]:
+        print("  all engines agree")
+    return not report["failures"]
+
+
+if __name__ == "__main__":
+    # Optional cube size, sequence count and length, e.g. "python fuzz.py 4 500 40"
+    args = [int(arg) for arg in sys.argv[1:4]]
+    sys.exit(0 if main(*args) else 1)
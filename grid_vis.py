@@ -0,0 +1,187 @@
+import math
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+import analytics
+import init
+from frame_budget import FrameBudget
+
+# Renders many init.py states as a grid of small cubes in one surface, e.g. one
+# cube per solver worker on a dashboard. All cubes share one projection of the
+# stickers, so each cell only offsets the same polygons. A cell is redrawn only
+# when one of its visible stickers changed color, and only the redrawn cells are
+# pushed to the display. pygame is imported where drawing happens, as in 2d_squares.
+
+BACKGROUND = (30, 30, 30)
+
+# Colors of the init.py color ids
+PALETTE = {
+    init.color_id["WHITE"]: (255, 255, 255),
+    init.color_id["RED"]: (255, 0, 0),
+    init.color_id["BLUE"]: (0, 0, 255),
+    init.color_id["GREEN"]: (0, 255, 0),
+    init.color_id["ORANGE"]: (255, 165, 0),
+    init.color_id["YELLOW"]: (255, 255, 0)
+}
+
+# Fraction of a cubie face covered by its sticker, the gaps show the background
+STICKER_SCALE = 0.88
+# Fraction of a cell covered by the cube
+CUBE_SCALE = 0.9
+
+
+def project_stickers(n: int = 3, rotation_x: float = math.pi / 6,
+                     rotation_y: float = -math.pi / 4) -> Tuple[np.ndarray, np.ndarray]:
+    """Stickers seen from the view direction and their outlines on screen.
+
+    Returns the compact state indices of the visible stickers and their
+    corners of shape (k, 4, 2) in screen coordinates (y down) of a cube
+    that fits into the unit square around the origin.
+    """
+    positions, normals = init.get_sticker_geometry(n)
+    # The two axes in the plane of every sticker
+    in_plane = np.abs(normals) == 0
+    u = np.eye(3)[np.argmax(in_plane, axis=1)]
+    v = np.eye(3)[2 - np.argmax(in_plane[:, ::-1], axis=1)]
+    centers = positions + 0.5 * normals
+    offsets = np.array([(-1, -1), (1, -1), (1, 1), (-1, 1)]) * STICKER_SCALE / 2
+    corners = centers[:, None] + offsets[:, 0, None] * u[:, None] + offsets[:, 1, None] * v[:, None]
+
+    # Turn around the y axis, then tilt around the x axis towards the viewer on +z
+    cy, sy, cx, sx = math.cos(rotation_y), math.sin(rotation_y), math.cos(rotation_x), math.sin(rotation_x)
+    rotation = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]]) @ np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    visible = np.flatnonzero(normals @ rotation.T @ (0, 0, 1) > 1e-9)
+    projected = (corners[visible] @ rotation.T)[..., :2] * (1, -1)
+    return visible, projected / (2 * np.abs(projected).max())
+
+
+class CubeGrid:
+    """A grid of count cubes of size n drawn into one surface.
+
+    draw() takes the states of all cubes as one (count, 6n^2) array and
+    redraws only the cells whose visible stickers changed since the last
+    call, returning the rectangles to pass to pygame.display.update.
+    """
+
+    def __init__(self, count: int, n: int = 3, columns: int = None, cell_size: int = 96,
+                 origin: Tuple[int, int] = (0, 0), labels: List[str] = None):
+        self.count, self.n = count, n
+        self.columns = columns or math.ceil(math.sqrt(count))
+        self.rows = math.ceil(count / self.columns)
+        self.cell_size = cell_size
+        self.size = (self.columns * cell_size, self.rows * cell_size)
+        self.labels = labels
+        self._label_surfaces = None
+
+        # One projection for all cells, each cell offsets the same polygons
+        self.visible, polygons = project_stickers(n)
+        cells = np.arange(count)
+        corners = np.column_stack([cells % self.columns, cells // self.columns]) * cell_size + origin
+        centers = corners + cell_size / 2
+        self.polygons = np.rint(polygons[None] * cell_size * CUBE_SCALE + centers[:, None, None]).astype(int).tolist()
+        self.rects = [(int(x), int(y), cell_size, cell_size) for x, y in corners]
+        self.drawn = np.full((count, len(self.visible)), -2, dtype=np.int16)  # Visible colors on screen, -2 = never drawn
+
+    def changed(self, states: np.ndarray) -> np.ndarray:
+        # Mask of the cells whose visible stickers differ from the screen
+        return (np.asarray(states)[:, self.visible] != self.drawn).any(axis=1)
+
+    def draw(self, surface: "pygame.Surface", states: np.ndarray, force: bool = False) -> List[Tuple[int, int, int, int]]:
+        import pygame
+
+        colors = np.asarray(states)[:, self.visible]
+        cells = np.arange(self.count) if force else np.flatnonzero(self.changed(states))
+        if self.labels and self._label_surfaces is None:
+            font = pygame.font.Font(None, 16)
+            self._label_surfaces = [font.render(label, True, (200, 200, 200)) for label in self.labels]
+        for cell, cell_colors in zip(cells.tolist(), colors[cells].tolist()):
+            surface.fill(BACKGROUND, self.rects[cell])
+            for polygon, color in zip(self.polygons[cell], cell_colors):
+                pygame.draw.polygon(surface, PALETTE[color], polygon)
+            if self._label_surfaces:
+                surface.blit(self._label_surfaces[cell], self.rects[cell][:2])
+        self.drawn[cells] = colors[cells]
+        return [self.rects[cell] for cell in cells.tolist()]
+
+
+def random_moves(states: np.ndarray, fraction: float, rng: np.random.Generator, n: int = 3) -> np.ndarray:
+    # One random turn on a random fraction of the states, all at once through the turn table
+    table, _ = analytics.get_turn_table(n)
+    moving = np.flatnonzero(rng.random(len(states)) < fraction)
+    moves = rng.integers(1, len(table), size=len(moving))
+    states[moving] = np.take_along_axis(states[moving], table[moves], axis=1)
+    return states
+
+
+def benchmark(count: int = 100, n: int = 3, frames: int = 300, fraction: float = 1.0) -> float:
+    # Average ms per frame of drawing count cubes into an off-screen surface,
+    # with fraction of the cubes turning every frame
+    import pygame
+
+    pygame.init()
+    grid = CubeGrid(count, n)
+    surface = pygame.Surface(grid.size)
+    states = np.tile(init.to_compact(init.get_cube(n)), (count, 1))
+    rng = np.random.default_rng(0)
+    grid.draw(surface, states)
+    elapsed = 0.0
+    for _ in range(frames):
+        states = random_moves(states, fraction, rng, n)
+        start = time.perf_counter()
+        grid.draw(surface, states)
+        elapsed += time.perf_counter() - start
+    return elapsed / frames * 1000
+
+
+def main(count: int = 100, n: int = 3):
+    # Demo: count scrambling cubes, SPACE pauses them, q toggles between all and few cubes turning
+    import pygame
+
+    pygame.init()
+    overlay_height = 24
+    grid = CubeGrid(count, n, origin=(0, overlay_height), labels=[str(i) for i in range(count)])
+    screen = pygame.display.set_mode((grid.size[0], grid.size[1] + overlay_height))
+    pygame.display.set_caption(f"{count} Rubik's Cubes")
+    font = pygame.font.Font(None, 24)
+    clock = pygame.time.Clock()
+    budget = FrameBudget(adaptive=False)
+    states = np.tile(init.to_compact(init.get_cube(n)), (count, 1))
+    rng = np.random.default_rng()
+    fraction = 1.0
+    paused = False
+    running = True
+    screen.fill(BACKGROUND)
+    pygame.display.flip()
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_q:
+                    fraction = 0.1 if fraction == 1.0 else 1.0
+            elif event.type != pygame.MOUSEMOTION:
+                grid.drawn[:] = -2  # Window exposed, resized...: redraw every cell
+
+        budget.start_frame()
+        if not paused:
+            states = random_moves(states, fraction, rng, n)
+        rects = grid.draw(screen, states)
+        overlay = (0, 0, grid.size[0], overlay_height)
+        screen.fill(BACKGROUND, overlay)
+        screen.blit(font.render(f"{budget.overlay_text()}  {len(rects)} cells redrawn", True, (255, 255, 255)), (10, 4))
+        pygame.display.update(rects + [overlay])
+        budget.end_frame()
+        clock.tick(60)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    # Optional number of cubes and cube size, e.g. "python grid_vis.py 64 4"
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import time
+
+# Cold start benchmark of the modules: every import runs in a fresh interpreter,
+# the time of an empty interpreter start is subtracted. Also lists the optional
+# dependencies each import pulled in, which should only happen for the server.
+# The budget cannot be met where importing numpy alone takes about 100 ms, as the
+# summary line then reports; the numpy preloaded column shows each module's own share.
+MODULES = ["numpy", "init", "cubie", "validate", "codec", "analytics", "solver",
+           "journal", "last_layer", "fuzz", "server", "2d_squares"]
+OPTIONAL = ["yaml", "pygame", "OpenGL", "multiprocessing", "asyncio"]
+BUDGET_MS = 100  # Cold start budget of the non-rendering modules
+
+# Imports numpy first when asked, so the second number is the cost of the module itself
+_SCRIPT = """
+import importlib, sys, time
+if sys.argv[2] == "1":
+    import numpy
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print((time.perf_counter() - start) * 1000)
+print(" ".join(name for name in sys.argv[3:] if name in sys.modules))
+"""
+
+
+def _run(module, preload_numpy=False):
+    start = time.perf_counter()
+    # Run next to the modules, so the benchmark works from any directory
+    output = subprocess.run([sys.executable, "-c", _SCRIPT, module, str(int(preload_numpy))] + OPTIONAL,
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.splitlines()
+    # The last two lines, modules such as pygame print a banner on import
+    return (time.perf_counter() - start) * 1000, float(output[-2]), output[-1].split()
+
+
+def measure(module, repeat=5):
+    """Cold start of a module in ms, its import time with numpy preloaded and the optional modules it loads.
+
+    The minimum of repeat runs is taken, as it is the least disturbed by other
+    processes. The cold start excludes the start of an empty interpreter.
+    """
+    baseline = min(_run("sys")[0] for _ in range(repeat))
+    runs = [_run(module) for _ in range(repeat)]
+    own = min(_run(module, True)[1] for _ in range(repeat))
+    return min(total for total, _, _ in runs) - baseline, own, runs[0][2]
+
+
+def main(modules=MODULES, repeat=5):
+    # Prints the table and a summary, returns whether every module met the budget
+    print(f"{'module':<12} {'cold start':>12} {'numpy preloaded':>17}  optional modules loaded")
+    over = []
+    for module in modules:
+        cold, own, loaded = measure(module, repeat)
+        if cold >= BUDGET_MS and module not in ("numpy", "server"):
+            over.append(module)
+        flag = "  over budget" if module in over else ""
+        print(f"{module:<12} {cold:10.1f}ms {own:15.1f}ms  {' '.join(loaded) or '-'}{flag}")
+    if over:
+        numpy_ms = measure("numpy", repeat)[0]
+        print(f"Budget of {BUDGET_MS} ms NOT met by {', '.join(over)}; importing numpy alone takes {numpy_ms:.1f} ms here")
+    else:
+        print(f"Budget of {BUDGET_MS} ms met")
+    return not over
+
+
+if __name__ == "__main__":
+    # Optional modules to measure, e.g. "python import_benchmark.py init solver"
+    sys.exit(0 if main(sys.argv[1:] or MODULES) else 1)
@@ -1,5 +1,7 @@
+import os
+from functools import lru_cache
+
 import numpy as np
-import yaml
 
 color_id = {
     "EMPTY": -1,
@@ -11,42 +13,189 @@ color_id = {
     "YELLOW": 5
 }
 
-side_to_idx = {
-    "UP": [[i, j] for i in range(0, 3) for j in range(3, 6)],
-    "DOWN": [[i, j] for i in range(6, 9) for j in range(3, 6)],
-    "FRONT": [[i, j] for i in range(3, 6) for j in range(3, 6)],
-    "LEFT": [[i, j] for i in range(3, 6) for j in range(0, 3)],
-    "RIGHT": [[i, j] for i in range(3, 6) for j in range(6, 9)],
-    "BACK": [[i, j] for i in range(3, 6) for j in range(9, 12)]
+
+def get_side_to_idx(n=3):
+    # Net cells of each side for an n x n x n cube, the net is 3n x 4n
+    return {
+        "UP": [[i, j] for i in range(0, n) for j in range(n, 2 * n)],
+        "DOWN": [[i, j] for i in range(2 * n, 3 * n) for j in range(n, 2 * n)],
+        "FRONT": [[i, j] for i in range(n, 2 * n) for j in range(n, 2 * n)],
+        "LEFT": [[i, j] for i in range(n, 2 * n) for j in range(0, n)],
+        "RIGHT": [[i, j] for i in range(n, 2 * n) for j in range(2 * n, 3 * n)],
+        "BACK": [[i, j] for i in range(n, 2 * n) for j in range(3 * n, 4 * n)]
+    }
+
+
+side_to_idx = get_side_to_idx(3)
+
+# Single letter names of the sides used in move notation
+face_letters = {"U": "UP", "D": "DOWN", "F": "FRONT", "B": "BACK", "L": "LEFT", "R": "RIGHT"}
+
+# Placement of each side in 3D: outward normal, direction of increasing column
+# and direction of increasing row. x points right, y up and z out of the FRONT side.
+side_frames = {
+    "UP": ((0, 1, 0), (1, 0, 0), (0, 0, 1)),
+    "DOWN": ((0, -1, 0), (1, 0, 0), (0, 0, -1)),
+    "FRONT": ((0, 0, 1), (1, 0, 0), (0, -1, 0)),
+    "LEFT": ((-1, 0, 0), (0, 0, 1), (0, -1, 0)),
+    "RIGHT": ((1, 0, 0), (0, 0, -1), (0, -1, 0)),
+    "BACK": ((0, 0, -1), (-1, 0, 0), (0, -1, 0))
 }
 
+# Order of the sides in the compact state of 6 * n * n stickers
+compact_sides = ["UP", "RIGHT", "FRONT", "DOWN", "LEFT", "BACK"]
+
+
+@lru_cache(maxsize=None)
+def get_compact_idx(n=3):
+    # Flat net index of every sticker of the compact state
+    sides = get_side_to_idx(n)
+    return np.array([i * 4 * n + j for side in compact_sides for i, j in sides[side]])
+
+
+compact_idx = get_compact_idx(3)
+
 
 def fill_cube_side(array, idx_arr, color):
     for i, j in idx_arr:
         array[i, j] = color
 
 
-def get_cube():
-    cube = np.full((9, 12), fill_value=-1)
-    fill_cube_side(cube, side_to_idx['UP'], color_id['WHITE'])
-    fill_cube_side(cube, side_to_idx['DOWN'], color_id['YELLOW'])
-    fill_cube_side(cube, side_to_idx['FRONT'], color_id['BLUE'])
-    fill_cube_side(cube, side_to_idx['LEFT'], color_id['RED'])
-    fill_cube_side(cube, side_to_idx['RIGHT'], color_id['ORANGE'])
-    fill_cube_side(cube, side_to_idx['BACK'], color_id['GREEN'])
+def get_cube(n=3):
+    sides = get_side_to_idx(n)
+    cube = np.full((3 * n, 4 * n), fill_value=-1)
+    fill_cube_side(cube, sides['UP'], color_id['WHITE'])
+    fill_cube_side(cube, sides['DOWN'], color_id['YELLOW'])
+    fill_cube_side(cube, sides['FRONT'], color_id['BLUE'])
+    fill_cube_side(cube, sides['LEFT'], color_id['RED'])
+    fill_cube_side(cube, sides['RIGHT'], color_id['ORANGE'])
+    fill_cube_side(cube, sides['BACK'], color_id['GREEN'])
     return cube
 
+@lru_cache(maxsize=None)
 def get_turns_list():
-    with open(f'moves.yml','r') as f:
+    # yaml is only needed for the net turns of moves.yml, so it is imported on first use
+    import yaml
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'moves.yml'), 'r') as f:
         turns_idx = yaml.safe_load(f)
+    return {side: np.array(turn) for side, turn in turns_idx.items()}
+
+
+def get_cube_size(state):
+    # n of a compact state or a batch of them
+    return int(round((np.shape(state)[-1] / 6) ** 0.5))
+
+
+def _quarter_turn_matrix(axis):
+    # Integer matrix of a clockwise quarter turn seen from the end of axis
+    x, y, z = axis
+    cross = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    return np.outer(axis, axis) - cross
+
+
+def _get_doubled_geometry(n):
+    # Sticker positions in doubled coordinates, so they are integers for even n too
+    positions, normals = [], []
+    for side in compact_sides:
+        normal, col_dir, row_dir = (np.array(v) for v in side_frames[side])
+        for row in range(n):
+            for col in range(n):
+                positions.append((n - 1) * normal + (2 * col - n + 1) * col_dir + (2 * row - n + 1) * row_dir)
+                normals.append(normal)
+    return np.array(positions), np.array(normals)
+
+
+@lru_cache(maxsize=None)
+def get_compact_turns(n=3):
+    # Permutations of the compact state for every outer and inner layer turn,
+    # generated from the sticker geometry. For n = 3 the outer turns equal moves.yml.
+    # "UP" turns the outer layer, "UP_1" the layer below it and so on up to "UP_<n-2>".
+    positions, normals = _get_doubled_geometry(n)
+    sticker_at = {(tuple(p), tuple(m)): index for index, (p, m) in enumerate(zip(positions, normals))}
+    dtype = np.int16 if len(positions) < 2 ** 15 else np.int32
+    turns = {}
+    for side in compact_sides:
+        axis = np.array(side_frames[side][0])
+        rotation = _quarter_turn_matrix(axis)
+        for depth in range(n - 1):
+            layer = np.flatnonzero(positions @ axis == n - 1 - 2 * depth)
+            turn = np.arange(len(positions), dtype=dtype)
+            for index, position, normal in zip(layer, positions[layer] @ rotation.T, normals[layer] @ rotation.T):
+                turn[sticker_at[(tuple(position), tuple(normal))]] = index
+            turn.setflags(write=False)
+            turns[side if depth == 0 else f"{side}_{depth}"] = turn
+    return turns
+
+
+def to_compact(cube):
+    return np.ravel(cube)[get_compact_idx(np.shape(cube)[0] // 3)]
+
+
+def from_compact(state):
+    n = get_cube_size(state)
+    cube = np.full(12 * n * n, fill_value=-1)
+    cube[get_compact_idx(n)] = state
+    return np.reshape(cube, (3 * n, 4 * n))
 
 
 def make_turn(array, side, turns):
-    flatten_array = np.ravel(array.copy())
-    rotated_array = flatten_array[turns[side]]
+    turn = turns[side]
+    if np.shape(array)[-1] == len(turn):
+        # Compact state, or a batch of them along the first axes
+        return array[..., turn]
+    flatten_array = np.ravel(array)
+    rotated_array = flatten_array[turn]
     return np.reshape(rotated_array, array.shape)
 
 
+def parse_moves(moves):
+    # "R U' F2" -> [("RIGHT", 1), ("UP", 3), ("FRONT", 2)], counted in clockwise quarter turns.
+    # A layer number selects an inner layer: "2R'" -> [("RIGHT_1", 3)].
+    # Turn names such as "RIGHT" or "RIGHT_1" are accepted as well.
+    if isinstance(moves, str):
+        moves = moves.split()
+    parsed = []
+    for move in moves:
+        if move.split("_")[0] in side_to_idx:
+            parsed.append((move, 1))
+            continue
+        layer = move[:len(move) - len(move.lstrip("0123456789"))]
+        face, suffix = move[len(layer):len(layer) + 1], move[len(layer) + 1:]
+        if face in face_letters and suffix in ("", "'", "2") and layer != "0":
+            side = face_letters[face] if int(layer or 1) == 1 else f"{face_letters[face]}_{int(layer) - 1}"
+            parsed.append((side, {"": 1, "'": 3, "2": 2}[suffix]))
+        else:
+            raise ValueError(f"Unknown move: {move}")
+    return parsed
+
+
+def format_moves(moves):
+    # Inverse of parse_moves: [("RIGHT", 1), ("UP_1", 3)] -> "R 2U'"
+    letters = {side: letter for letter, side in face_letters.items()}
+    names = []
+    for side, quarter_turns in moves:
+        side, _, depth = side.partition("_")
+        layer = str(int(depth) + 1) if depth else ""
+        names.append(layer + letters[side] + {1: "", 2: "2", 3: "'"}[quarter_turns % 4])
+    return " ".join(names)
+
+
+def apply_moves(array, moves, turns):
+    # Works on the net and on the compact state, given the matching turns
+    for side, quarter_turns in parse_moves(moves):
+        for _ in range(quarter_turns):
+            array = make_turn(array, side, turns)
+    return array
+
+
+def get_sticker_geometry(n=3):
+    # Position of the cubie carrying each sticker of the compact state and the outward
+    # normal of the sticker. Cubies are one unit apart and centered on the origin,
+    # so for n = 3 the coordinates are -1, 0 and 1.
+    positions, normals = _get_doubled_geometry(n)
+    return positions / 2, normals
+
+
 def get_face_data(cube_data, face_index):
     if face_index == 0:  # Front face
         return cube_data[3:6, 3:6]
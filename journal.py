@@ -0,0 +1,175 @@
+import io
+import os
+import time
+
+import numpy as np
+
+import analytics
+import codec
+import init
+
+# Append-only move journal of a cube session.
+# The journal file holds a header and one 11 byte record per applied move: the move
+# id (a row of analytics.get_turn_table), its kind and the time in ms since the
+# session started. Undo and redo are recorded as the moves they apply, so the state
+# after record k is always the replay of records 0..k-1. Every interval records the
+# full state is written to a checkpoint file next to it (path + ".ckpt"), so seeking
+# replays at most interval - 1 moves. Checkpoints lost in a crash are rebuilt on open.
+MAGIC = b"RJNL"
+VERSION = 2
+MOVE, UNDO, REDO = 0, 1, 2
+
+HEADER = np.dtype([("magic", "S4"), ("version", "u1"), ("n", "u1"), ("reserved", "<u2"),
+                   ("interval", "<u4"), ("created", "<f8"), ("reserved2", "<u4")])
+RECORD = np.dtype([("move", "<u2"), ("kind", "u1"), ("time", "<u8")])
+
+DEFAULT_INTERVAL = 1024
+
+
+class Journal:
+    """Session recorder with checkpointed random access and undo/redo.
+
+    path None keeps the journal in memory. An existing journal is opened
+    for appending, its state and undo/redo history are restored. state is
+    the initial compact state of a new journal, solved by default.
+    """
+
+    def __init__(self, path=None, n=3, interval=DEFAULT_INTERVAL, state=None):
+        self.path = path
+        if path is not None and os.path.exists(path):
+            self.records_file = open(path, "r+b")
+            self.checkpoint_file = open(path + ".ckpt", "r+b")
+            header = np.frombuffer(self.records_file.read(HEADER.itemsize), dtype=HEADER)
+            if len(header) == 0 or header["magic"][0] != MAGIC or header["version"][0] != VERSION:
+                raise ValueError(f"{path} is no move journal")
+            self.n, self.interval, self.created = int(header["n"][0]), int(header["interval"][0]), float(header["created"][0])
+            self.count = (os.path.getsize(path) - HEADER.itemsize) // RECORD.itemsize
+        else:
+            self.records_file = open(path, "w+b") if path is not None else io.BytesIO()
+            self.checkpoint_file = open(path + ".ckpt", "w+b") if path is not None else io.BytesIO()
+            self.n, self.interval, self.created, self.count = n, interval, time.time(), 0
+            header = np.zeros(1, dtype=HEADER)
+            header[0] = (MAGIC, VERSION, n, 0, interval, self.created, 0)
+            self.records_file.write(header.tobytes())
+            start = codec.to_sticker_states(init.get_cube(n) if state is None else state, n)
+            if len(start) != 1:
+                raise ValueError(f"Expected one initial state, got {len(start)}")
+            self.checkpoint_file.write(codec.pack_stickers(start).tobytes())
+
+        self.table, rows = analytics.get_turn_table(self.n)
+        self.move_ids = rows  # (side, quarter turns) -> move id
+        self.moves = {move: key for key, move in rows.items()}  # Move id -> (side, quarter turns)
+        self.inverse = {move: rows[side, 4 - quarter_turns] for move, (side, quarter_turns) in self.moves.items()}
+        self.checkpoint_size = codec.sticker_record_size(self.n)
+        self._repair()
+
+        # Undo and redo stacks hold move ids, rebuilt from the kinds of the records
+        self.undo_stack, self.redo_stack = [], []
+        records = self.read(0, self.count)
+        for move, kind in zip(records["move"].tolist(), records["kind"].tolist()):
+            self._update_stacks(move, kind)
+        self.state = self.seek(self.count)
+        self.records_file.seek(0, io.SEEK_END)
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _repair(self):
+        # Drops a partly written record and rebuilds the checkpoints missing after a crash
+        self.records_file.truncate(HEADER.itemsize + self.count * RECORD.itemsize)
+        self.checkpoint_file.seek(0, io.SEEK_END)
+        stored = self.checkpoint_file.tell() // self.checkpoint_size
+        if stored == 0:
+            raise ValueError(f"{self.path} has lost its initial state")
+        needed = self.count // self.interval + 1
+        self.checkpoint_file.truncate(min(stored, needed) * self.checkpoint_size)
+        for checkpoint in range(stored, needed):
+            state = self._replay(checkpoint - 1, checkpoint * self.interval)
+            self.checkpoint_file.seek(0, io.SEEK_END)
+            self.checkpoint_file.write(codec.pack_stickers(state).tobytes())
+
+    def _replay(self, checkpoint, k):
+        # State after the first k records, from the given checkpoint on
+        self.checkpoint_file.flush()
+        self.checkpoint_file.seek(checkpoint * self.checkpoint_size)
+        packed = np.frombuffer(self.checkpoint_file.read(self.checkpoint_size), dtype=np.uint8)
+        state = codec.unpack_stickers(packed, self.n)[0]
+        for move in self.read(checkpoint * self.interval, k)["move"].tolist():
+            state = state[self.table[move]]
+        return state
+
+    def _update_stacks(self, move, kind):
+        if kind == MOVE:
+            self.undo_stack.append(move)
+            self.redo_stack.clear()
+        elif kind == UNDO:
+            self.redo_stack.append(self.undo_stack.pop())
+        else:
+            self.undo_stack.append(self.redo_stack.pop())
+
+    def _append(self, move, kind):
+        self._update_stacks(move, kind)
+        self.state = self.state[self.table[move]]
+        record = np.zeros(1, dtype=RECORD)
+        record[0] = (move, kind, int((time.time() - self.created) * 1000))
+        self.records_file.seek(0, io.SEEK_END)
+        self.records_file.write(record.tobytes())
+        self.count += 1
+        if self.count % self.interval == 0:
+            self.checkpoint_file.seek(0, io.SEEK_END)
+            self.checkpoint_file.write(codec.pack_stickers(self.state).tobytes())
+
+    def record(self, side, quarter_turns=1):
+        # A move applied by the user, e.g. record("RIGHT", 3) for R'. Clears the redo history.
+        quarter_turns %= 4
+        if quarter_turns:
+            self._append(self.move_ids[side, quarter_turns], MOVE)
+
+    def record_moves(self, moves):
+        # Records a notation string such as "R U R' U'"
+        for side, quarter_turns in init.parse_moves(moves):
+            self.record(side, quarter_turns)
+
+    def undo(self):
+        # Records and returns (side, quarter turns) that undo the last move, None if there is none
+        if not self.undo_stack:
+            return None
+        move = self.inverse[self.undo_stack[-1]]
+        self._append(move, UNDO)
+        return self.moves[move]
+
+    def redo(self):
+        # Records and returns (side, quarter turns) that redo the last undone move
+        if not self.redo_stack:
+            return None
+        move = self.redo_stack[-1]
+        self._append(move, REDO)
+        return self.moves[move]
+
+    def read(self, start, stop):
+        # Records start..stop-1 as a structured array with fields move, kind and time
+        self.records_file.flush()
+        self.records_file.seek(HEADER.itemsize + start * RECORD.itemsize)
+        data = self.records_file.read((stop - start) * RECORD.itemsize)
+        return np.frombuffer(data, dtype=RECORD)
+
+    def seek(self, k):
+        # Compact state after the first k records: the checkpoint before it plus a short replay
+        if not 0 <= k <= self.count:
+            raise IndexError(f"Journal has {self.count} records, cannot seek to {k}")
+        return self._replay(k // self.interval, k)
+
+    def history(self, start=0, stop=None):
+        # Moves of records start..stop-1 in notation, e.g. ["R", "U'", "2R"]
+        records = self.read(start, self.count if stop is None else stop)
+        return init.format_moves(self.moves[move] for move in records["move"].tolist()).split()
+
+    def close(self):
+        self.records_file.close()
+        self.checkpoint_file.close()
@@ -0,0 +1,231 @@
+from functools import lru_cache
+from itertools import permutations
+
+import numpy as np
+
+import cubie
+import init
+import solver
+import validate
+
+# Last layer case recognition for the 3x3x3. A last layer state has the first two
+# layers solved, so only the four U corners and U edges (positions 0..3) differ.
+# Cases are the classes of states under pre-AUF and post-AUF (U turns before and
+# after), which also covers y rotations of the whole cube. Mirrored cases stay
+# separate, as their algorithms differ.
+
+# Algorithms that are registered by default, the case each solves is worked out from the moves
+KNOWN_ALGORITHMS = {
+    "T perm": "R U R' U' R' F R2 U' R' U' R U R' F'",
+    "Ja perm": "L' U' L F L' U' L U L F' L2 U L",
+    "Jb perm": "R U R' F' R U R' U' R' F R2 U' R'",
+    "Y perm": "F R U' R' U' R U R' F' R U R' U' R' F R F'",
+    "Ua perm": "R U' R U R U R U' R' U' R2",
+    "Ub perm": "R2 U R U R' U' R' U' R' U R'",
+    "H perm": "R2 U2 R U2 R2 U2 R2 U2 R U2 R2",
+    "Aa perm": "R' F R' B2 R F' R' B2 R2",
+    "Ab perm": "R B' R F2 R' B R F2 R2",
+    "Sune": "R U R' U R U2 R'",
+    "Antisune": "R U2 R' U' R U' R'",
+    "OLL H": "R U R' U R U' R' U R U2 R'",
+    "OLL Pi": "R U2 R2 U' R2 U' R2 U2 R",
+    "OLL Headlights": "R2 D R' U2 R D' R' U2 R'",
+    "OLL T": "F R U R' U' F'",
+}
+
+# U turns by number of clockwise quarter turns
+AUF = ["", "U", "U2", "U'"]
+
+# Kinds of last layer cases
+SOLVED, PLL, ZBLL, ONE_LOOK = "solved", "pll", "zbll", "1lll"
+
+N_LL = 24 * 27 * 24 * 8  # Dense key range of last layer states
+N_OLL = 27 * 8  # Dense key range of orientation patterns
+
+
+def _rank4(perms):
+    return cubie.perm_rank(perms[..., :4])
+
+
+def _orientation_key(co, eo):
+    # The fourth orientation follows from the other three
+    return (co[..., :3] @ np.array([9, 3, 1])) * 8 + eo[..., :3] @ np.array([4, 2, 1])
+
+
+def ll_key(cp, co, ep, eo):
+    return (_rank4(cp) * 27 + co[..., :3] @ np.array([9, 3, 1])) * 192 + _rank4(ep) * 8 + eo[..., :3] @ np.array([4, 2, 1])
+
+
+def _pre(state, move):
+    # move followed by the states, all moves here leave orientations alone
+    cp, co, ep, eo = state
+    m_cp, _, m_ep, _ = move
+    return m_cp[cp], co, m_ep[ep], eo
+
+
+def _post(state, move):
+    cp, co, ep, eo = state
+    m_cp, m_co, m_ep, m_eo = move
+    return cp[..., m_cp], (co[..., m_cp] + m_co) % 3, ep[..., m_ep], (eo[..., m_ep] + m_eo) % 2
+
+
+@lru_cache(maxsize=None)
+def get_auf_moves():
+    # Cubie states of U^k, k = 0..3
+    moves = [cubie.solved()]
+    for _ in range(3):
+        moves.append(cubie.multiply(moves[-1], cubie.get_moves()[0]))
+    return moves
+
+
+def _all_states():
+    # Every last layer state as batched cubie arrays
+    perms = np.array(list(permutations(range(4))))
+    parity = validate.parity(perms)
+    cp4, ep4 = (a.ravel() for a in np.meshgrid(np.arange(24), np.arange(24), indexing="ij"))
+    cp4, ep4 = cp4[parity[cp4] == parity[ep4]], ep4[parity[cp4] == parity[ep4]]
+    # Orientations of four pieces with the last one following from the others
+    co = cubie.decode_co(np.arange(27))[:, 4:]
+    eo = cubie.decode_eo(np.arange(8))[:, 8:]
+    p, c, e = (a.ravel() for a in np.meshgrid(np.arange(len(cp4)), np.arange(27), np.arange(8), indexing="ij"))
+    count = len(p)
+    return (np.hstack([perms[cp4[p]], np.tile(np.arange(4, 8), (count, 1))]),
+            np.hstack([co[c], np.zeros((count, 4), dtype=int)]),
+            np.hstack([perms[ep4[p]], np.tile(np.arange(4, 12), (count, 1))]),
+            np.hstack([eo[e], np.zeros((count, 8), dtype=int)]))
+
+
+def _classes(keys):
+    # keys of shape (variants, N) -> case id of every state, the variant that turns it
+    # into the case representative and the index of each representative
+    canonical = keys.min(axis=0)
+    _, cases = np.unique(canonical, return_inverse=True)
+    variant = np.argmin(keys, axis=0)
+    representatives = np.empty(cases.max() + 1, dtype=int)
+    is_representative = variant == 0
+    representatives[cases[is_representative]] = np.flatnonzero(is_representative)
+    return cases, variant, representatives
+
+
+class LastLayerIndex:
+    """Dense lookup tables from last layer states to case ids.
+
+    ll_table[ll_key] holds (case, pre, post) such that the state is
+    U^pre, then the case representative, then U^post; oll_table does the
+    same for orientation patterns with (case, post). Recognition is one
+    table lookup per state, for single states and batches alike.
+    """
+
+    def __init__(self, algorithms=KNOWN_ALGORITHMS):
+        aufs = get_auf_moves()
+        states = _all_states()
+
+        # Keys of U^a s U^b for all 16 (a, b)
+        variants = [(a, b) for a in range(4) for b in range(4)]
+        keys = np.array([ll_key(*_post(_pre(states, aufs[a]), aufs[b])) for a, b in variants])
+        cases, variant, representatives = _classes(keys)
+        inverse_aufs = np.array([[(-a) % 4, (-b) % 4] for a, b in variants])
+        self.ll_table = np.full((N_LL, 3), -1, dtype=np.int32)
+        self.ll_table[keys[0]] = np.column_stack([cases, inverse_aufs[variant]])
+        self.ll_representatives = tuple(a[representatives] for a in states)
+        _, co, _, eo = self.ll_representatives
+        oriented_edges = (eo == 0).all(axis=1)
+        self.ll_kind = np.full(len(representatives), ONE_LOOK, dtype=object)
+        self.ll_kind[oriented_edges] = ZBLL
+        self.ll_kind[oriented_edges & (co == 0).all(axis=1)] = PLL
+        self.ll_kind[self.ll_table[0, 0]] = SOLVED
+
+        # Orientation patterns only depend on the post-AUF
+        keys = np.array([_orientation_key(*_post(states, aufs[b])[1::2]) for b in range(4)])
+        cases, variant, representatives = _classes(keys)
+        self.oll_table = np.full((N_OLL, 2), -1, dtype=np.int32)
+        self.oll_table[keys[0]] = np.column_stack([cases, (-variant) % 4])
+        # Representatives with solved permutation, so their algorithms only orient
+        cp, _, ep, _ = cubie.solved()
+        count = len(representatives)
+        self.oll_representatives = (np.tile(cp, (count, 1)), states[1][representatives],
+                                    np.tile(ep, (count, 1)), states[3][representatives])
+
+        self.ll_algorithms = {}  # case -> [(name, moves)] solving the representative
+        self.oll_algorithms = {}  # case -> [(name, moves)] orienting the representative
+        for name, moves in algorithms.items():
+            self.add_algorithm(moves, name)
+
+    def __len__(self):
+        return len(self.ll_kind)
+
+    def lookup(self, cubes):
+        """Cases of compact states, init nets or batches of them.
+
+        Returns a dict of arrays: ll_case, ll_pre, ll_post, oll_case and
+        oll_post. States whose first two layers are not solved, or that
+        cannot be solved at all, get -1.
+        """
+        cp, co, ep, eo = cubie.from_stickers(validate.to_states(cubes))
+        f2l = ((cp[:, 4:] == np.arange(4, 8)).all(axis=1) & (co[:, 4:] == 0).all(axis=1)
+               & (ep[:, 4:] == np.arange(4, 12)).all(axis=1) & (eo[:, 4:] == 0).all(axis=1))
+        # The keys leave out the last twist and flip, which only solvable states imply
+        f2l &= ((np.sort(cp[:, :4], axis=1) == np.arange(4)).all(axis=1)
+                & (np.sort(ep[:, :4], axis=1) == np.arange(4)).all(axis=1)
+                & (co.sum(axis=1) % 3 == 0) & (eo.sum(axis=1) % 2 == 0)
+                & (validate.parity(cp[:, :4]) == validate.parity(ep[:, :4])))
+        keys = np.where(f2l, ll_key(cp, co, ep, eo), 0)
+        ll = np.where(f2l[:, None], self.ll_table[keys], -1)
+        oll = np.where(f2l[:, None], self.oll_table[np.where(f2l, _orientation_key(co, eo), 0)], -1)
+        return {"ll_case": ll[:, 0], "ll_pre": ll[:, 1], "ll_post": ll[:, 2], "oll_case": oll[:, 0], "oll_post": oll[:, 1]}
+
+    def add_algorithm(self, moves, name=None):
+        # Registers moves for the last layer case they solve and for its orientation case.
+        # Returns the last layer case.
+        moves = moves.split() if isinstance(moves, str) else list(moves)
+        state = init.apply_moves(init.to_compact(init.get_cube()), solver.invert(moves), init.get_compact_turns())
+        found = self.lookup(state)
+        if found["ll_case"][0] < 0:
+            raise ValueError(f"{' '.join(moves)} does not keep the first two layers")
+        # The state is U^pre, the representative, U^post: U^post, moves, U^pre solves the representative
+        case, pre, post = (int(found[key][0]) for key in ("ll_case", "ll_pre", "ll_post"))
+        self.ll_algorithms.setdefault(case, []).append((name, solver.simplify(AUF[post].split() + moves + AUF[pre].split())))
+        case, post = int(found["oll_case"][0]), int(found["oll_post"][0])
+        self.oll_algorithms.setdefault(case, []).append((name, solver.simplify(AUF[post].split() + moves)))
+        return int(found["ll_case"][0])
+
+    def _algorithm(self, algorithms, representatives, case, time_budget):
+        # Registered moves for a case, or moves searched for its representative
+        if case not in algorithms:
+            faces = cubie.to_faces(*(a[case] for a in representatives))
+            algorithms[case] = [(None, solver.solve(init.to_compact(init.get_cube())[4::9][faces], time_budget))]
+        return algorithms[case][0][1]
+
+    def algorithm(self, case, time_budget=2.0):
+        # Moves that solve the representative of a last layer case
+        return self._algorithm(self.ll_algorithms, self.ll_representatives, case, time_budget)
+
+    def oll_algorithm(self, case, time_budget=2.0):
+        # Moves that orient the representative of an orientation case
+        return self._algorithm(self.oll_algorithms, self.oll_representatives, case, time_budget)
+
+    def solution(self, cube, time_budget=2.0):
+        # Moves that solve a last layer state: AUF, case algorithm, AUF
+        found = self.lookup(cube)
+        case, pre, post = (int(found[key][0]) for key in ("ll_case", "ll_pre", "ll_post"))
+        if case < 0:
+            raise ValueError("Not a valid state with the first two layers solved")
+        moves = self.algorithm(case, time_budget)
+        return solver.simplify(AUF[-post % 4].split() + moves + AUF[-pre % 4].split())
+
+    def orientation(self, cube, time_budget=2.0):
+        # Moves that orient the last layer of a state: AUF and orientation algorithm
+        found = self.lookup(cube)
+        case, post = int(found["oll_case"][0]), int(found["oll_post"][0])
+        if case < 0:
+            raise ValueError("Not a valid state with the first two layers solved")
+        return solver.simplify(AUF[-post % 4].split() + self.oll_algorithm(case, time_budget))
+
+
+@lru_cache(maxsize=None)
+def get_index():
+    return LastLayerIndex()
+
+
+def recognize(cubes):
+    return get_index().lookup(cubes)
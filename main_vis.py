@@ -3,6 +3,13 @@ from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import numpy as np
+import sys
+from collections import deque
+from functools import lru_cache
+
+import init
+from frame_budget import FrameBudget
+from journal import Journal
 
 # ===========================
 # 1. Library Import
@@ -11,22 +18,39 @@ import numpy as np
 # Pygame for window management and event handling
 # PyOpenGL for 3D rendering
 # NumPy for mathematical operations
+# init for the cube state and the moves
+# journal for the move history, undo and redo
 
 # ===========================
 # 2. Cube Initialization
 # ===========================
 
+# Cube size, e.g. "python main_vis.py 4" for a 4x4x4 cube
+cube_n = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+# Coordinate of the outer layers, cubies are one unit apart around the origin
+outer_layer = (cube_n - 1) / 2
+
 # Define colors for cube faces (R, G, B)
 colors_dict = {
     'W': (1, 1, 1),    # Up face (White)
     'Y': (1, 1, 0),    # Down face (Yellow)
-    'R': (1, 0, 0),    # Front face (Red)
-    'O': (1, 0.5, 0),  # Back face (Orange)
-    'G': (0, 1, 0),    # Right face (Green)
-    'B': (0, 0, 1),    # Left face (Blue)
+    'B': (0, 0, 1),    # Front face (Blue)
+    'G': (0, 1, 0),    # Back face (Green)
+    'O': (1, 0.5, 0),  # Right face (Orange)
+    'R': (1, 0, 0),    # Left face (Red)
     'K': (0, 0, 0)     # Black (for cubie base)
 }
 
+# Map init color ids to color codes
+state_colors = {
+    init.color_id['WHITE']: 'W',
+    init.color_id['YELLOW']: 'Y',
+    init.color_id['BLUE']: 'B',
+    init.color_id['GREEN']: 'G',
+    init.color_id['ORANGE']: 'O',
+    init.color_id['RED']: 'R'
+}
+
 # Define the vertices of a cubie centered at the origin (full size)
 cubie_size = 1.0  # Full size cubie
 half_size = cubie_size / 2
@@ -63,15 +87,10 @@ face_normals = [
     (-1, 0, 0)   # Left
 ]
 
-# Map face normals to color codes
-face_colors = {
-    (0, 0, -1): 'O',  # Back face (Orange)
-    (0, 0, 1): 'R',   # Front face (Red)
-    (0, -1, 0): 'Y',  # Bottom face (Yellow)
-    (0, 1, 0): 'W',   # Top face (White)
-    (1, 0, 0): 'G',   # Right face (Green)
-    (-1, 0, 0): 'B'   # Left face (Blue)
-}
+# Map (cubie position, face normal) to the sticker index in the init state
+sticker_positions, sticker_normals = init.get_sticker_geometry(cube_n)
+sticker_index = {(tuple(position), tuple(normal)): index
+                 for index, (position, normal) in enumerate(zip(sticker_positions, sticker_normals))}
 
 # Sticker size scale (fraction of the cubie face)
 sticker_scale = 0.9  # Adjusted to ensure stickers don't overhang
@@ -81,17 +100,13 @@ sticker_offset = 0.002  # Increased to avoid stickers being too deep
 
 # Cubie class represents each small cube in the Rubik's Cube
 class Cubie:
-    def __init__(self, position):
-        self.initial_position = np.array(position, dtype=float)
-        self.position = np.array(position, dtype=float)
-        self.rotation_matrix = np.identity(3)
+    def __init__(self, index):
+        # Cubies stay in place, the colors of their stickers come from cube_state
+        # and animation is only applied when drawing
+        self.index = index
         self.faces = []
         self.stickers = []
         self.create_faces_and_stickers()
-        self.animating = False  # Flag to indicate if the cubie is animating
-        self.animation_axis = None
-        self.animation_angle_remaining = 0
-        self.animation_speed = 0
 
     def create_faces_and_stickers(self):
         x, y, z = self.position
@@ -99,17 +114,17 @@ class Cubie:
             nx, ny, nz = normal
             # Check if the face should have a sticker (on the outer layer)
             has_sticker = False
-            if nx == 1 and x == 1:
+            if nx == 1 and x == outer_layer:
                 has_sticker = True
-            elif nx == -1 and x == -1:
+            elif nx == -1 and x == -outer_layer:
                 has_sticker = True
-            elif ny == 1 and y == 1:
+            elif ny == 1 and y == outer_layer:
                 has_sticker = True
-            elif ny == -1 and y == -1:
+            elif ny == -1 and y == -outer_layer:
                 has_sticker = True
-            elif nz == 1 and z == 1:
+            elif nz == 1 and z == outer_layer:
                 has_sticker = True
-            elif nz == -1 and z == -1:
+            elif nz == -1 and z == -outer_layer:
                 has_sticker = True
 
             face = {
@@ -132,70 +147,45 @@ class Cubie:
                     sticker_vertices.append(sticker_vertex)
                 sticker = {
                     'vertices': sticker_vertices,
-                    'color_code': face_colors[tuple(normal)]
+                    'index': sticker_index[(tuple(self.position), tuple(normal.astype(int)))]
                 }
                 self.stickers.append(sticker)
 
-    def start_animation(self, axis, angle, speed):
-        self.animating = True
-        self.animation_axis = axis
-        self.animation_angle_remaining = angle
-        self.animation_speed = speed
-
-    def update(self):
-        if self.animating:
-            angle_step = np.sign(self.animation_angle_remaining) * min(abs(self.animation_speed), abs(self.animation_angle_remaining))
-            self.rotate(self.animation_axis, angle_step)
-            self.animation_angle_remaining -= angle_step
-            if abs(self.animation_angle_remaining) < 0.01:
-                self.animating = False
-                self.animation_angle_remaining = 0
-                self.animation_axis = None
-                self.animation_speed = 0
-
-    def rotate(self, axis, angle):
-        # Update the rotation matrix
-        rot_matrix = rotation_matrix(axis, angle)
-        self.rotation_matrix = np.dot(rot_matrix, self.rotation_matrix)
-        # Rotate position around the origin
-        self.position = np.dot(rot_matrix, self.position)
-        self.position = np.round(self.position, decimals=5)  # Avoid floating point errors
-
-    def draw(self):
+    @property
+    def position(self):
+        return cubie_positions[self.index]
+
+    def draw(self, borders=True):
         glPushMatrix()
         # Move to the cubie's position
         glTranslatef(*self.position)
-        # Apply the cubie's rotation
-        glMultMatrixf(self.get_gl_matrix())
-        # Draw the cubie as a black cube
-        glBegin(GL_QUADS)
-        glColor3fv(colors_dict['K'])
-        for face in self.faces:
-            normal = face['normal']
-            glNormal3fv(normal)
-            for vertex_index in face['indices']:
-                vertex = cube_vertices[vertex_index]
-                glVertex3fv(vertex)
-        glEnd()
+        # Draw the cubie as a black cube, it shows as the border between stickers
+        if borders:
+            glBegin(GL_QUADS)
+            glColor3fv(colors_dict['K'])
+            for face in self.faces:
+                normal = face['normal']
+                glNormal3fv(normal)
+                for vertex_index in face['indices']:
+                    vertex = cube_vertices[vertex_index]
+                    glVertex3fv(vertex)
+            glEnd()
         # Draw the stickers
         glEnable(GL_POLYGON_OFFSET_FILL)
         glPolygonOffset(-1.0, -1.0)
         for sticker in self.stickers:
             glBegin(GL_QUADS)
-            glColor3fv(colors_dict[sticker['color_code']])
+            glColor3fv(colors_dict[state_colors[cube_state[sticker['index']]]])
             for vertex in sticker['vertices']:
                 glVertex3fv(vertex)
             glEnd()
         glDisable(GL_POLYGON_OFFSET_FILL)
         glPopMatrix()
 
-    def get_gl_matrix(self):
-        # Convert the rotation matrix to a 4x4 OpenGL matrix
-        mat = np.identity(4)
-        mat[:3, :3] = self.rotation_matrix
-        return mat.T.flatten()
-
-# Helper function to create a rotation matrix
+# Helper function to create a rotation matrix.
+# Animation steps only use a few (axis, angle) pairs, so results are cached;
+# axis must be a tuple and the returned array must not be modified.
+@lru_cache(maxsize=1024)
 def rotation_matrix(axis, angle):
     axis = np.array(axis, dtype=float)
     axis = axis / np.linalg.norm(axis)
@@ -208,15 +198,42 @@ def rotation_matrix(axis, angle):
         [y*x*(1 - cos_a) + z*sin_a,   cos_a + y*y*(1 - cos_a),   y*z*(1 - cos_a) - x*sin_a],
         [z*x*(1 - cos_a) - y*sin_a,   z*y*(1 - cos_a) + x*sin_a, cos_a + z*z*(1 - cos_a)]
     ])
+    rot.setflags(write=False)
     return rot
 
+# Same rotation as a 4x4 matrix laid out for glMultMatrixf
+@lru_cache(maxsize=1024)
+def gl_rotation_matrix(axis, angle):
+    mat = np.identity(4)
+    mat[:3, :3] = rotation_matrix(axis, angle)
+    mat = mat.T.flatten()
+    mat.setflags(write=False)
+    return mat
+
+# Cube state from the init state engine, moves are only computed there
+cube_turns = init.get_compact_turns(cube_n)
+cube_state = init.to_compact(init.get_cube(cube_n))
+
+# Move history, e.g. "python main_vis.py 3 session.rjnl" keeps it in a file and
+# continues a saved session. Moves are recorded when queued, so the journal state
+# is the state the cube reaches once the queue is done.
+journal = Journal(sys.argv[2] if len(sys.argv) > 2 else None, cube_n)
+if journal.n != cube_n:
+    raise ValueError(f"The journal is for a {journal.n}x{journal.n}x{journal.n} cube")
+cube_state = journal.state
+
+# Positions of all visible cubies
+layer_coordinates = np.arange(cube_n) - outer_layer
+cubie_positions = np.array([(x, y, z) for x in layer_coordinates for y in layer_coordinates for z in layer_coordinates
+                            if max(abs(x), abs(y), abs(z)) == outer_layer])
+
 # Create all cubies and store them in a list
-cubies = []
-for x in [-1, 0, 1]:
-    for y in [-1, 0, 1]:
-        for z in [-1, 0, 1]:
-            cubie = Cubie((x, y, z))
-            cubies.append(cubie)
+cubies = [Cubie(index) for index in range(len(cubie_positions))]
+
+# Cubie indices by position + outer_layer, so a layer is a single slice of this grid.
+# Hidden inner cubies are -1.
+cubie_grid = np.full((cube_n, cube_n, cube_n), -1)
+cubie_grid[tuple(np.rint(cubie_positions + outer_layer).astype(int).T)] = np.arange(len(cubies))
 
 # ===========================
 # 3. User Interaction
@@ -248,65 +265,171 @@ cube_rotation_matrix = np.identity(4, dtype=float)
 # Function to rotate the entire cube
 def rotate_cube(axis, angle):
     global cube_rotation_matrix
-    rot_matrix = np.identity(4)
-    rot_matrix[:3, :3] = rotation_matrix(axis, angle)
-    cube_rotation_matrix = np.dot(rot_matrix, cube_rotation_matrix)
-
-# Queue for face rotations (to prevent multiple rotations at once)
-face_rotation_queue = []
-
-# Function to rotate a specific face with animation
+    cube_rotation_matrix[:3, :3] = rotation_matrix(axis, angle) @ cube_rotation_matrix[:3, :3]
+
+# Queue for face rotations. Moves are buffered here while another face is
+# still animating, so key presses and scripted sequences are never dropped.
+face_rotation_queue = deque()
+
+# Frames one move takes at playback speed 1.0
+frames_per_turn = 10
+# Multiplier for the animation speed (2.0 plays twice as fast)
+playback_speed = 1.0
+# Fast-forward: apply queued moves instantly instead of animating them
+skip_animation = False
+
+# Move being animated as (face, angle) and the angle shown so far
+current_rotation = None
+current_rotation_angle = 0
+
+# Layer selection and rotation axis of a turn. A turn is a face letter for the
+# outer layers ('F') or an init turn name for any layer ('RIGHT', 'RIGHT_1').
+def turn_layer(turn):
+    side, _, depth = init.face_letters.get(turn, turn).partition('_')
+    axis = init.side_frames[side][0]
+    axis_index = int(np.flatnonzero(axis)[0])
+    layer = axis[axis_index] * (outer_layer - int(depth or 0))
+    return axis_index, int(round(layer + outer_layer)), axis
+
+# Function to queue a face rotation, it is animated once earlier moves finish
 def rotate_face(face, angle_degrees):
-    if face_rotation_queue:
-        return  # Don't start a new rotation until the current one is finished
-
-    angle = angle_degrees
-    if face == 'F':  # Front face (z = 1)
-        cubies_to_rotate = [cubie for cubie in cubies if round(cubie.position[2]) == 1]
-        axis = (0, 0, 1)
-    elif face == 'B':  # Back face (z = -1)
-        cubies_to_rotate = [cubie for cubie in cubies if round(cubie.position[2]) == -1]
-        axis = (0, 0, -1)
-    elif face == 'U':  # Up face (y = 1)
-        cubies_to_rotate = [cubie for cubie in cubies if round(cubie.position[1]) == 1]
-        axis = (0, 1, 0)
-    elif face == 'D':  # Down face (y = -1)
-        cubies_to_rotate = [cubie for cubie in cubies if round(cubie.position[1]) == -1]
-        axis = (0, -1, 0)
-    elif face == 'R':  # Right face (x = 1)
-        cubies_to_rotate = [cubie for cubie in cubies if round(cubie.position[0]) == 1]
-        axis = (1, 0, 0)
-    elif face == 'L':  # Left face (x = -1)
-        cubies_to_rotate = [cubie for cubie in cubies if round(cubie.position[0]) == -1]
-        axis = (-1, 0, 0)
-    else:
+    if init.face_letters.get(face, face) not in cube_turns:
         return  # Invalid face input
+    face_rotation_queue.append((face, angle_degrees))
+    journal.record(init.face_letters.get(face, face), int(round(-angle_degrees / 90)))
+
+# Undo or redo the last move, animated like any other move
+def undo_move():
+    move = journal.undo()
+    if move:
+        face_rotation_queue.append(parse_move(*move))
+
+def redo_move():
+    move = journal.redo()
+    if move:
+        face_rotation_queue.append(parse_move(*move))
+
+# Face letter of each init side name
+side_letters = {side: letter for letter, side in init.face_letters.items()}
+
+# Function to queue a whole move sequence, e.g. solver output.
+# Accepts (face, angle) pairs or a notation string such as "R U R' U2".
+def queue_moves(moves):
+    if isinstance(moves, str):
+        moves = [parse_move(side, quarter_turns) for side, quarter_turns in init.parse_moves(moves)]
+    for face, angle in moves:
+        rotate_face(face, angle)
+
+# Convert a move from init.parse_moves to a (face, angle) pair.
+# A clockwise turn seen from the face is a negative angle around its axis.
+def parse_move(side, quarter_turns):
+    face = side_letters.get(side, side)
+    return face, (-90, -180, 90)[quarter_turns - 1]
+
+def set_playback_speed(speed):
+    global playback_speed
+    playback_speed = min(max(speed, 0.25), 1000.0)
+
+# Indices of the cubies in a face layer and the rotation axis of the face
+def cubies_in_layer(face):
+    axis_index, layer, axis = turn_layer(face)
+    index = [slice(None)] * 3
+    index[axis_index] = layer
+    layer_cubies = cubie_grid[tuple(index)].ravel()
+    return layer_cubies[layer_cubies >= 0], axis
+
+# Apply a move to the cube state without animation
+def apply_face_rotation(face, angle):
+    global cube_state
+    quarter_turns = int(round(-angle / 90)) % 4
+    cube_state = init.apply_moves(cube_state, [init.face_letters.get(face, face)] * quarter_turns, cube_turns)
+
+# Start the animation of a move
+def start_face_rotation(face, angle):
+    global current_rotation, current_rotation_angle
+    current_rotation = (face, angle)
+    current_rotation_angle = 0
+
+# Finish the running animation immediately
+def finish_face_rotation():
+    global current_rotation, current_rotation_angle
+    if current_rotation:
+        apply_face_rotation(*current_rotation)
+    current_rotation = None
+    current_rotation_angle = 0
+
+# Advance the move queue by one frame
+def update_face_rotations():
+    global current_rotation_angle
+    if skip_animation:
+        finish_face_rotation()
+        while face_rotation_queue:
+            apply_face_rotation(*face_rotation_queue.popleft())
+        return
+
+    if current_rotation is None and face_rotation_queue:
+        # Faster than one move per frame: apply whole moves without animating
+        moves_per_frame = int(playback_speed // frames_per_turn)
+        if moves_per_frame:
+            for _ in range(min(moves_per_frame, len(face_rotation_queue))):
+                apply_face_rotation(*face_rotation_queue.popleft())
+            return
+        start_face_rotation(*face_rotation_queue.popleft())
+
+    if current_rotation:
+        angle = current_rotation[1]
+        current_rotation_angle += angle * playback_speed / frames_per_turn
+        if abs(current_rotation_angle) >= abs(angle) - 0.01:
+            finish_face_rotation()
+
+# Draw all cubies, the animating layer is rotated by the angle shown so far
+def draw_cubies(borders=True):
+    animating = np.zeros(len(cubies), dtype=bool)
+    if current_rotation:
+        layer, axis = cubies_in_layer(current_rotation[0])
+        animating[layer] = True
+    for cubie in cubies:
+        if not animating[cubie.index]:
+            cubie.draw(borders)
+    if animating.any():
+        glPushMatrix()
+        glMultMatrixf(gl_rotation_matrix(axis, current_rotation_angle))
+        for index in layer:
+            cubies[index].draw(borders)
+        glPopMatrix()
 
-    # Start animation for each cubie on the face
-    for cubie in cubies_to_rotate:
-        cubie.start_animation(axis, angle, angle / 10.0)  # Rotate over 10 frames
+# Draw a line of text in the top left corner of the window
+overlay_font = pygame.font.Font(None, 24)
 
-    face_rotation_queue.append(True)  # Add a placeholder to indicate rotation in progress
+def draw_overlay(text):
+    surface = overlay_font.render(text, True, (255, 255, 255))
+    data = pygame.image.tostring(surface, 'RGBA', True)
+    glDisable(GL_DEPTH_TEST)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glWindowPos2d(10, display[1] - 10 - surface.get_height())
+    glDrawPixels(surface.get_width(), surface.get_height(), GL_RGBA, GL_UNSIGNED_BYTE, data)
+    glDisable(GL_BLEND)
+    glEnable(GL_DEPTH_TEST)
 
 # ===========================
 # 4. State Management
 # ===========================
 
-# The internal state of the cube is maintained within each cubie.
-# Each cubie has a position and a rotation matrix.
-# Rotations are applied to the cubie's rotation matrix and position.
+# The state of the cube is cube_state, the compact sticker state of init.
+# A move is applied to it by init exactly once, when its animation finishes;
+# the animation itself is only a rotation applied in draw_cubies.
+# Cubies never move, each sticker reads its color from cube_state.
+# cubie_grid maps positions to cubie indices for layer selection.
 
 # ===========================
 # 5. Algorithm Integration (Placeholder)
 # ===========================
 
 # Placeholder for integrating solving algorithms
-# You can access and manipulate the cube's state using the cubies list
-# Each cubie has:
-# - position: cubie.position
-# - rotation matrix: cubie.rotation_matrix
-# - initial position: cubie.initial_position
-# - faces: cubie.faces
+# The cube's state is cube_state, see init.to_compact / init.from_compact
+# Solutions can be played back with queue_moves("R U R' U'")
+# Cubie index by position: cubie_grid[x + outer_layer, y + outer_layer, z + outer_layer]
 
 # ===========================
 # Main Loop
@@ -314,49 +437,76 @@ def rotate_face(face, angle_degrees):
 
 running = True
 clock = pygame.time.Clock()
+budget = FrameBudget()
+dirty = True  # Redraw needed
+camera_moving = False
 while running:
     clock.tick(60)  # Limit FPS to 60
+    if not dirty and not camera_moving and current_rotation is None and not face_rotation_queue:
+        # Nothing changed: sleep until the next event instead of redrawing
+        pygame.event.post(pygame.event.wait())
+
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif event.type not in (pygame.KEYDOWN, pygame.MOUSEMOTION):
+            dirty = True  # Window exposed, resized, focused...
 
         # Handle keyboard input
         elif event.type == pygame.KEYDOWN:
+            dirty = True
             # Rotate faces with specific keys
             if event.key == pygame.K_f:
                 if event.mod & pygame.KMOD_SHIFT:
-                    rotate_face('F', -90)
-                else:
                     rotate_face('F', 90)
+                else:
+                    rotate_face('F', -90)
             elif event.key == pygame.K_b:
                 if event.mod & pygame.KMOD_SHIFT:
-                    rotate_face('B', -90)
-                else:
                     rotate_face('B', 90)
+                else:
+                    rotate_face('B', -90)
             elif event.key == pygame.K_u:
                 if event.mod & pygame.KMOD_SHIFT:
-                    rotate_face('U', -90)
-                else:
                     rotate_face('U', 90)
+                else:
+                    rotate_face('U', -90)
             elif event.key == pygame.K_d:
                 if event.mod & pygame.KMOD_SHIFT:
-                    rotate_face('D', -90)
-                else:
                     rotate_face('D', 90)
+                else:
+                    rotate_face('D', -90)
             elif event.key == pygame.K_r:
                 if event.mod & pygame.KMOD_SHIFT:
-                    rotate_face('R', -90)
-                else:
                     rotate_face('R', 90)
+                else:
+                    rotate_face('R', -90)
             elif event.key == pygame.K_l:
                 if event.mod & pygame.KMOD_SHIFT:
-                    rotate_face('L', -90)
-                else:
                     rotate_face('L', 90)
+                else:
+                    rotate_face('L', -90)
+            # Playback controls for queued moves
+            elif event.key == pygame.K_SPACE:
+                skip_animation = not skip_animation
+            elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                set_playback_speed(playback_speed * 2)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                set_playback_speed(playback_speed / 2)
+            # Move history
+            elif event.key == pygame.K_z:
+                undo_move()
+            elif event.key == pygame.K_y:
+                redo_move()
+            # Toggle adaptive quality
+            elif event.key == pygame.K_q:
+                budget.adaptive = not budget.adaptive
+                budget.high_quality = True
 
     # Continuous cube rotation with arrow keys
     keys = pygame.key.get_pressed()
     rotation_speed = 2  # Degrees per frame
+    camera_moving = keys[pygame.K_LEFT] or keys[pygame.K_RIGHT] or keys[pygame.K_UP] or keys[pygame.K_DOWN]
     if keys[pygame.K_LEFT]:
         rotate_cube((0, 1, 0), rotation_speed)
     if keys[pygame.K_RIGHT]:
@@ -366,31 +516,33 @@ while running:
     if keys[pygame.K_DOWN]:
         rotate_cube((1, 0, 0), -rotation_speed)
 
-    # Update animations
-    animating = False
-    for cubie in cubies:
-        cubie.update()
-        if cubie.animating:
-            animating = True
+    # Update animations and start queued moves
+    if current_rotation is not None or face_rotation_queue:
+        update_face_rotations()
+        dirty = True
 
-    # If no cubies are animating, clear the rotation queue
-    if not animating and face_rotation_queue:
-        face_rotation_queue.pop(0)
+    # Skip the frame when the cube is idle and the camera is still
+    if not dirty and not camera_moving:
+        continue
+    budget.start_frame()
 
     # Clear the screen and depth buffer
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
     # Reset the modelview matrix
     glLoadIdentity()
-    glTranslatef(0.0, 0.0, -10)
+    glTranslatef(0.0, 0.0, -10 * cube_n / 3)
 
     # Apply cube rotations
     glMultMatrixf(cube_rotation_matrix.T)
 
-    # Draw all cubies
-    for cubie in cubies:
-        cubie.draw()
+    # Draw all cubies, without borders when frames take too long
+    draw_cubies(budget.high_quality)
+    draw_overlay(budget.overlay_text())
 
     pygame.display.flip()
+    budget.end_frame()
+    dirty = False
 
+journal.close()
 pygame.quit()
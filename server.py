@@ -0,0 +1,161 @@
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import solver
+import validate
+
+# Solve server: one JSON request per line over TCP, e.g. {"state": [54 colors]} or
+# {"state": <init net>}, answered with {"solution": ["R", "U'", ...], ...}.
+# {"stats": true} returns the request count and p50/p99 latencies.
+DEFAULT_PORT = 8765
+
+
+def _init_worker():
+    solver.get_search_tables()
+    solver.get_two_phase_tables()
+
+
+def solve_batch(states, time_budget):
+    # Runs in a worker process: compact states of shape (N, 54) -> one result dict each.
+    # The chunk is validated, converted to search coordinates and bounded by the pattern
+    # databases in a few array operations. Solved states need no search, and a solution
+    # as long as its bound ends the search of a state as proven optimal.
+    errors = validate.validate(states)
+    valid = np.flatnonzero(errors == validate.OK)
+    coords, bounds = solver.batch_coords(states[valid])
+    results = [{"error": f"Invalid cube state: {', '.join(validate.describe(error))}"} for error in errors.tolist()]
+    for index, state_coords, bound in zip(valid.tolist(), coords.tolist(), bounds.tolist()):
+        if bound == 0:
+            results[index] = {"solution": [], "length": 0, "optimal": True}
+        else:
+            results[index] = solver.solve_report(states[index], time_budget, tuple(state_coords))
+    return results
+
+
+class SolveServer:
+    """Coalesces identical requests and solves concurrent ones in micro-batches.
+
+    A request waits at most batch_window seconds for others to join its batch,
+    a batch is split over the worker processes. Requests for a state that is
+    already being solved share its result.
+    """
+
+    def __init__(self, processes=None, batch_size=16, batch_window=0.005, time_budget=1.0, latency_window=10000):
+        self.pool = ProcessPoolExecutor(processes, initializer=_init_worker)
+        self.processes = self.pool._max_workers
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.time_budget = time_budget
+        self.in_flight = {}  # Face id state bytes -> future of the result
+        self.pending = []  # (key, state, future) waiting for the next batch
+        self.flush_handle = None
+        self.latencies = deque(maxlen=latency_window)  # Seconds per request
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    async def solve(self, state):
+        start = time.perf_counter()
+        state = validate.to_states(state)[0]
+        # States that only differ in their colors are the same request
+        key = solver.to_faces(state).astype(np.uint8).tobytes()
+        self.requests += 1
+
+        loop = asyncio.get_running_loop()
+        future = self.in_flight.get(key)
+        if future is None:
+            future = self.in_flight[key] = loop.create_future()
+            self.pending.append((key, state, future))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+            elif self.flush_handle is None:
+                self.flush_handle = loop.call_later(self.batch_window, self._flush)
+        else:
+            self.coalesced += 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.batches += 1
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        states = np.array([state for _, state, _ in batch])
+        chunks = np.array_split(np.arange(len(batch)), min(self.processes, len(batch)))
+        try:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(self.pool, solve_batch, states[chunk], self.time_budget) for chunk in chunks))
+            results = [result for chunk_results in results for result in chunk_results]
+        except Exception as error:
+            results = [error] * len(batch)
+            if isinstance(error, BrokenProcessPool):
+                # A worker died, later requests need a new pool
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = ProcessPoolExecutor(self.processes, initializer=_init_worker)
+        for (key, _, future), result in zip(batch, results):
+            del self.in_flight[key]
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        p50, p99 = np.percentile(latencies, [50, 99]).tolist() if latencies.size else (0.0, 0.0)
+        return {"requests": self.requests, "coalesced": self.coalesced, "batches": self.batches,
+                "in_flight": len(self.in_flight), "p50_ms": round(p50, 2), "p99_ms": round(p99, 2)}
+
+    async def handle(self, reader, writer):
+        # One JSON request per line, requests of a connection are answered in order
+        while line := await reader.readline():
+            try:
+                request = json.loads(line)
+                if request.get("stats"):
+                    response = self.stats()
+                else:
+                    response = await self.solve(request["state"])
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                response = {"error": f"{type(error).__name__}: {error}"}
+            except Exception as error:
+                # Failures of the workers, e.g. BrokenProcessPool, still get an answer
+                response = {"error": f"Solver failed: {type(error).__name__}: {error}"}
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+        writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def main(port=DEFAULT_PORT):
+    server = SolveServer()
+    try:
+        asyncio.run(server.serve(port=port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
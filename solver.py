@@ -0,0 +1,553 @@
+import time
+from functools import lru_cache
+from itertools import product
+
+import numpy as np
+
+import cubie
+import init
+import validate
+
+# Optimal solver for the 3x3x3 cube in the half turn metric: IDA* with Korf's
+# corner and edge set pattern databases as the heuristic.
+# Bounds below this depth are searched in the calling process, pool start-up costs more.
+PARALLEL_MIN_DEPTH = 8
+
+
+@lru_cache(maxsize=None)
+def get_coordinate_tables():
+    # Python lists of the co, eo and cp move tables, scalar access to them is much
+    # faster than to NumPy arrays inside a search
+    return tuple(table.tolist() for table in cubie.get_move_tables())
+
+
+@lru_cache(maxsize=None)
+def get_search_tables():
+    # Move tables and pattern databases of the IDA* search. The edge set move table is
+    # too large for lists and is accessed through a flat memoryview instead. The pattern
+    # databases are only kept as bytes, which index faster than a memoryview.
+    co_move, _, cp_move = get_coordinate_tables()
+    edge_move = memoryview(np.ascontiguousarray(cubie.get_edge_set_move_table()).ravel())
+    corners, edges_a, edges_b = (table.tobytes() for table in cubie.get_korf_tables())
+    return co_move, cp_move, edge_move, corners, edges_a, edges_b
+
+
+def to_faces(cube):
+    # Compact state of face ids 0..5 of an init net or compact state,
+    # raises ValueError for states that cannot be solved
+    state = validate.to_states(cube)[0]
+    validate.check(state)
+    return cubie.sticker_faces(state)
+
+
+def to_coords(cube):
+    # (co, cp, edge set a, edge set b) search state of an init net or compact state
+    cp, co, ep, eo = cubie.from_faces(to_faces(cube))
+    return (int(cubie.co_coord(co)), int(cubie.perm_rank(cp)[0]),
+            *(int(cubie.edge_set_coord(ep, eo, pieces)[0]) for pieces in cubie.EDGE_SETS))
+
+
+def batch_coords(cubes):
+    # Search coordinates of shape (N, 4) and their lower bounds of a batch of valid states,
+    # in a few array operations instead of to_coords and heuristic per state
+    cp, co, ep, eo = cubie.from_stickers(validate.to_states(cubes))
+    coords = np.column_stack([cubie.co_coord(co), cubie.perm_rank(cp),
+                              *(cubie.edge_set_coord(ep, eo, pieces) for pieces in cubie.EDGE_SETS)])
+    corners, edges_a, edges_b = (np.frombuffer(table, dtype=np.uint8) for table in get_search_tables()[3:])
+    bounds = np.maximum.reduce([corners[coords[:, 1] * cubie.N_CO + coords[:, 0]], edges_a[coords[:, 2]], edges_b[coords[:, 3]]])
+    return coords, bounds
+
+
+def heuristic(coords):
+    _, _, _, corners, edges_a, edges_b = get_search_tables()
+    co, cp, a, b = coords
+    return max(corners[cp * cubie.N_CO + co], edges_a[a], edges_b[b])
+
+
+def apply_move_coords(coords, move):
+    co_move, cp_move, edge_move, _, _, _ = get_search_tables()
+    co, cp, a, b = coords
+    return (co_move[co][move], cp_move[cp][move],
+            edge_move[(a >> 6) * 18 + move] ^ (a & 63), edge_move[(b >> 6) * 18 + move] ^ (b & 63))
+
+
+def is_canonical(last_face, face):
+    # Never turn the same face twice in a row, and turn opposite faces in one order only
+    return face != last_face and not (cubie.opposite_face[face] == last_face and face < last_face)
+
+
+# Moves allowed after a move of last_face, indexed by last_face (-1 at the root)
+CANONICAL_MOVES = {last_face: [move for move in range(18) if is_canonical(last_face, move // 3)]
+                   for last_face in range(-1, 6)}
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Search:
+    """Depth first search below one bound of IDA*.
+
+    cancel is an optional event that stops the search, it is checked every
+    check_interval nodes. limit skips all solutions longer than it.
+    """
+
+    FOUND = -1
+
+    def __init__(self, cancel=None, check_interval=4096, limit=None):
+        self.tables = get_search_tables()
+        self.cancel = cancel
+        self.check_interval = check_interval
+        self.limit = float('inf') if limit is None else limit
+        self.nodes = 0
+        self.path = []
+
+    def run(self, coords, bound, last_face=-1, depth=0):
+        # Returns (moves, None) when a solution within bound exists, otherwise
+        # (None, smallest estimated length above bound) for the next iteration
+        self.path = []
+        estimate = depth + heuristic(coords)
+        if estimate > bound:
+            return None, estimate
+        if estimate > self.limit:
+            return None, float('inf')
+        if estimate == depth:
+            return [], None
+        result = self._dfs(*coords, depth, bound, last_face)
+        if result == self.FOUND:
+            return list(self.path), None
+        return None, result
+
+    def _dfs(self, co, cp, a, b, depth, bound, last_face):
+        # Expands an unsolved node within bound. The children are estimated here,
+        # so those beyond the bound cost no call.
+        co_move, cp_move, edge_move, corners, edges_a, edges_b = self.tables
+        self.nodes += 1
+        if self.cancel is not None and self.nodes % self.check_interval == 0 and self.cancel.is_set():
+            raise Cancelled()
+
+        minimum = float('inf')
+        depth += 1
+        co_next, cp_next = co_move[co], cp_move[cp]
+        a_row, a_flips, b_row, b_flips = (a >> 6) * 18, a & 63, (b >> 6) * 18, b & 63
+        for move in CANONICAL_MOVES[last_face]:
+            child_co, child_cp = co_next[move], cp_next[move]
+            child_a, child_b = edge_move[a_row + move] ^ a_flips, edge_move[b_row + move] ^ b_flips
+            estimate = depth + max(corners[child_cp * cubie.N_CO + child_co], edges_a[child_a], edges_b[child_b])
+            if estimate > bound:
+                if estimate < minimum:
+                    minimum = estimate
+                continue
+            if estimate > self.limit:
+                continue
+            self.path.append(move)
+            if estimate == depth:
+                # Every table is 0 only at its solved coordinate
+                return self.FOUND
+            result = self._dfs(child_co, child_cp, child_a, child_b, depth, bound, move // 3)
+            if result == self.FOUND:
+                return result
+            self.path.pop()
+            if result < minimum:
+                minimum = result
+        return minimum
+
+
+def root_prefixes(split_depth):
+    # Canonical move sequences of split_depth moves, the subtrees handed to workers
+    prefixes = []
+    for prefix in product(range(18), repeat=split_depth):
+        faces = [-1] + [move // 3 for move in prefix]
+        if all(is_canonical(a, b) for a, b in zip(faces, faces[1:])):
+            prefixes.append(prefix)
+    return prefixes
+
+
+# Set in each worker process by _init_worker
+_cancel_event = None
+
+
+def _init_worker(cancel_event):
+    global _cancel_event
+    _cancel_event = cancel_event
+    get_search_tables()
+
+
+def _search_subtree(task):
+    coords, prefix, bound = task
+    if _cancel_event.is_set():
+        return None, float('inf')
+    for move in prefix:
+        coords = apply_move_coords(coords, move)
+    try:
+        path, next_bound = Search(_cancel_event).run(coords, bound, prefix[-1] // 3, len(prefix))
+    except Cancelled:
+        return None, float('inf')
+    if path is not None:
+        return list(prefix) + path, None
+    return None, next_bound
+
+
+def _search_parallel(pool, cancel_event, coords, bound, prefixes):
+    cancel_event.clear()
+    solution, next_bound = None, float('inf')
+    tasks = [(coords, prefix, bound) for prefix in prefixes]
+    for path, subtree_bound in pool.imap_unordered(_search_subtree, tasks):
+        if path is not None and solution is None:
+            # Every bound below this one is exhausted, so the solution is optimal:
+            # the remaining workers are cancelled
+            solution = path
+            cancel_event.set()
+        elif subtree_bound is not None:
+            next_bound = min(next_bound, subtree_bound)
+    return solution, next_bound
+
+
+def solve_optimal(cube, max_depth=20, processes=None, split_depth=2):
+    """Shortest solution of an init net or compact state, in the half turn metric.
+
+    Bounds from PARALLEL_MIN_DEPTH on are split at the first split_depth
+    plies over processes worker processes (default: all cores); the first
+    worker that finds a solution cancels the others. Returns the moves as
+    a list such as ["R", "U2", "F'"], or None if none is within max_depth.
+    Each extra ply costs about 13 times more: exhausting bound 14 takes about
+    a minute per core, typical random states (17-18 moves) need days of CPU.
+    """
+    import multiprocessing  # Only the parallel search needs it, so it is imported here
+    coords = to_coords(cube)
+    get_search_tables()
+    bound = heuristic(coords)
+    processes = processes or multiprocessing.cpu_count()
+    prefixes = root_prefixes(split_depth)
+    pool = cancel_event = None
+    try:
+        while bound <= max_depth:
+            # Subtrees below a prefix only hold solutions of at least split_depth moves
+            if processes == 1 or bound < max(PARALLEL_MIN_DEPTH, split_depth):
+                path, next_bound = Search().run(coords, bound)
+            else:
+                if pool is None:
+                    cancel_event = multiprocessing.Event()
+                    pool = multiprocessing.Pool(processes, _init_worker, (cancel_event,))
+                path, next_bound = _search_parallel(pool, cancel_event, coords, bound, prefixes)
+            if path is not None:
+                return [cubie.move_names[move] for move in path]
+            bound = next_bound
+        return None
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+# ===========================
+# Bidirectional search
+# ===========================
+
+# Default cap on the states held by solve_bidirectional, about STATE_BYTES each as
+# measured with the dict entry, its key and the frontier row
+MAX_STATES = 2_000_000
+STATE_BYTES = 150
+# Average number of new states per expanded state, used to check the cap before a level
+BRANCHING = 13
+# States expanded at once, their children are the only temporary arrays of a level
+EXPAND_CHUNK = 4096
+
+
+@lru_cache(maxsize=None)
+def get_move_perms():
+    # Compact state permutations of the 18 moves in the order of cubie.move_names
+    turns = init.get_compact_turns(3)
+    perms = []
+    for side in init.compact_sides:
+        perm = np.arange(54)
+        for _ in range(3):
+            perm = perm[turns[side]]
+            perms.append(perm)
+    return np.array(perms)
+
+
+def inverse_move(move):
+    return move - move % 3 + 2 - move % 3
+
+
+def _pack(faces):
+    # Two face ids per byte, rows of 27 bytes
+    faces = faces.astype(np.uint8)
+    return (faces[..., 0::2] << 4) | faces[..., 1::2]
+
+
+def _trace(visited, faces, perms):
+    # Moves from the root of a search side to faces, following the recorded last moves back
+    moves = []
+    code = visited[_pack(faces).view('S27')[0]]
+    while code % 32:
+        move = code // 32
+        moves.append(move)
+        faces = faces[perms[inverse_move(move)]]
+        code = visited[_pack(faces).view('S27')[0]]
+    return moves[::-1]
+
+
+def solve_bidirectional(cube, max_states=MAX_STATES, max_depth=20, processes=None):
+    """Shortest solution found by breadth first search from both the state and solved.
+
+    The smaller frontier is expanded one level at a time until the two meet.
+    If the next level could take the stored states, counting the children
+    of one expanded chunk, above max_states, the search gives up and falls
+    back to solve_optimal. The default cap, about 300 MB, holds states up
+    to 10 moves from solved (about 1.3M states, 2 s here). Longer ones fall
+    back after about 2.5 s. It needs no pattern databases, but once those
+    are loaded solve_optimal takes milliseconds at these depths. Returns
+    the moves as a list like solve_optimal.
+    """
+    start = to_faces(cube)
+    goal = np.repeat(np.arange(6, dtype=np.int8), 9)
+    perms = get_move_perms()
+    # Packed state -> last move * 32 + depth, per side
+    sides = [{_pack(start).view('S27')[0]: 0}, {_pack(goal).view('S27')[0]: 0}]
+    frontiers = [start[None], goal[None]]
+    depths = [0, 0]
+    if np.array_equal(start, goal):
+        return []
+
+    while sum(depths) < max_depth:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        visited, other, frontier = sides[side], sides[1 - side], frontiers[side]
+        temporary = min(len(frontier), EXPAND_CHUNK) * 18
+        if len(visited) + len(other) + len(frontier) * BRANCHING + temporary > max_states:
+            return solve_optimal(cube, max_depth, processes)
+
+        depth = depths[side] + 1
+        new, best = [], None
+        for chunk_start in range(0, len(frontier), EXPAND_CHUNK):
+            children = frontier[chunk_start:chunk_start + EXPAND_CHUNK][:, perms].reshape(-1, 54)
+            # Rows as bytes objects; trailing zero bytes dropped by the S dtype keep keys unique
+            keys = _pack(children).view('S27').ravel().tolist()
+            fresh = []
+            for i, key in enumerate(keys):
+                if key in visited:
+                    continue
+                visited[key] = i % 18 * 32 + depth
+                fresh.append(i)
+                if key in other:
+                    length = depth + other[key] % 32
+                    if best is None or length < best[0]:
+                        best = length, children[i]
+            new.append(children[fresh])
+        if best is not None:
+            # Solutions of this level and earlier levels of the other side can
+            # differ in length, so the whole level is checked before choosing
+            faces = best[1]
+            forward = _trace(sides[0], faces, perms)
+            backward = _trace(sides[1], faces, perms)
+            path = forward + [inverse_move(move) for move in reversed(backward)]
+            return [cubie.move_names[move] for move in path]
+        frontiers[side] = np.concatenate(new) if new else frontier[:0]
+        if not len(frontiers[side]):
+            return None
+        depths[side] = depth
+    return None
+
+
+# ===========================
+# Anytime search
+# ===========================
+
+class Deadline:
+    # Stands in for the cancel event of Search, set once the time is up
+    def __init__(self, seconds):
+        self.end = time.perf_counter() + seconds
+
+    def is_set(self):
+        return time.perf_counter() >= self.end
+
+
+def invert(moves):
+    # Moves that undo moves, a list or a string in init.parse_moves notation
+    return init.format_moves((side, 4 - turns) for side, turns in reversed(init.parse_moves(moves))).split()
+
+
+def simplify(moves):
+    # Merge consecutive turns of the same layer, e.g. "R R2 U U'" -> "R'"
+    merged = []
+    for side, turns in init.parse_moves(moves):
+        if merged and merged[-1][0] == side:
+            turns = (turns + merged.pop()[1]) % 4
+        if turns:
+            merged.append((side, turns))
+    return init.format_moves(merged).split()
+
+
+def is_solved(state):
+    # Every side of a compact state in one color
+    faces = np.reshape(state, (6, -1))
+    return bool((faces == faces[:, :1]).all())
+
+
+@lru_cache(maxsize=None)
+def get_two_phase_tables():
+    slice_move, co_slice, eo_slice = cubie.get_phase1_tables()
+    cp_move, ud_edge_move, slice_perm_move, cp_slice, ud_slice = cubie.get_phase2_tables()
+    return (slice_move.tolist(), co_slice.tobytes(), eo_slice.tobytes(), cp_move.tolist(),
+            ud_edge_move.tolist(), slice_perm_move.tolist(), cp_slice.tobytes(), ud_slice.tobytes())
+
+
+class TwoPhase:
+    """Kociemba's two-phase search, yields shorter and shorter solutions.
+
+    Phase 1 moves the cube into the group of U, D, R2, L2, F2, B2 (all
+    orientations solved and the middle layer edges in the middle layer),
+    phase 2 solves it within that group. Every phase 1 solution of increasing
+    length is completed with the shortest phase 2 that beats the best total.
+    """
+
+    def __init__(self, cube, cancel=None, check_interval=256):
+        self.state = cubie.from_faces(to_faces(cube))
+        self.cancel = cancel
+        self.check_interval = check_interval
+        self.nodes = 0
+        self.best = None
+
+    def _tick(self):
+        self.nodes += 1
+        if self.cancel is not None and self.nodes % self.check_interval == 0 and self.cancel.is_set():
+            raise Cancelled()
+
+    def solutions(self, max_length=30):
+        # Raises Cancelled when cancel is set
+        co_move, eo_move, _ = get_coordinate_tables()
+        slice_move, co_slice, eo_slice = get_two_phase_tables()[:3]
+        cp, co, ep, eo = self.state
+        coords = int(cubie.co_coord(co)), int(cubie.eo_coord(eo)), int(cubie.slice_coord(ep))
+        self.best = max_length + 1
+        path = []
+
+        def phase1(co, eo, slice_, togo, last_face):
+            if togo == 0:
+                if co == 0 and eo == 0 and slice_ == 0:
+                    yield from self._phase2(path, last_face)
+                return
+            if max(co_slice[co * cubie.N_SLICE + slice_], eo_slice[eo * cubie.N_SLICE + slice_]) > togo:
+                return
+            self._tick()
+            for move in range(18):
+                face = move // 3
+                # A phase 1 ending in a phase 2 move was found one move shorter already
+                if not is_canonical(last_face, face) or (togo == 1 and move in cubie.phase2_moves):
+                    continue
+                path.append(move)
+                yield from phase1(co_move[co][move], eo_move[eo][move], slice_move[slice_][move], togo - 1, face)
+                path.pop()
+
+        length = 0
+        while length < self.best:
+            yield from phase1(*coords, length, -1)
+            length += 1
+
+    def _phase2(self, phase1_path, last_face):
+        cp_move, ud_edge_move, slice_perm_move, cp_slice, ud_slice = get_two_phase_tables()[3:]
+        state = self.state
+        for move in phase1_path:
+            state = cubie.multiply(state, cubie.get_moves()[move])
+        cp, _, ep, _ = state
+        cp, ud_edge, slice_perm = (int(cubie.perm_rank(cp)[0]), int(cubie.perm_rank(ep[:8])[0]),
+                                   int(cubie.perm_rank(ep[8:] - 8)[0]))
+        path = []
+
+        def search(cp, ud_edge, slice_perm, togo, last_face):
+            h = max(cp_slice[cp * cubie.N_SLICE_PERM + slice_perm], ud_slice[ud_edge * cubie.N_SLICE_PERM + slice_perm])
+            if h > togo:
+                return False
+            if h == 0:
+                return True
+            self._tick()
+            for i, move in enumerate(cubie.phase2_moves):
+                face = move // 3
+                if not is_canonical(last_face, face):
+                    continue
+                path.append(move)
+                if search(cp_move[cp][i], ud_edge_move[ud_edge][i], slice_perm_move[slice_perm][i], togo - 1, face):
+                    return True
+                path.pop()
+            return False
+
+        for togo in range(self.best - len(phase1_path)):
+            if search(cp, ud_edge, slice_perm, togo, last_face):
+                self.best = len(phase1_path) + len(path)
+                yield [cubie.move_names[move] for move in phase1_path + path]
+                return
+
+
+def solve_anytime(cube, time_budget=10.0, history=None, check_interval=256, status=None, coords=None):
+    """Yields successively shorter solutions of an init net or compact state.
+
+    history, the moves that led from solved to the state, gives an instant
+    first solution when its inverse solves the state. The two-phase search
+    then finds a solution within milliseconds and keeps improving it, and
+    IDA* below the best length so far finally proves a solution optimal.
+    The generator ends after time_budget seconds or at the optimal solution,
+    and the caller may stop consuming it at any point. status, an optional
+    dict, gets status["optimal"] = True once the last solution is proven optimal.
+    A solution as long as the pattern database bound is optimal right away.
+    coords are the to_coords of the state when already known, e.g. from batch_coords.
+    """
+    status = {} if status is None else status
+    status["optimal"] = False
+    coords = to_coords(cube) if coords is None else coords
+    # Table set-up does not count against the budget
+    get_search_tables()
+    get_two_phase_tables()
+    deadline = Deadline(time_budget)
+    bound = heuristic(coords)
+    best = None
+    if history is not None:
+        moves = simplify(invert(history))
+        if is_solved(init.apply_moves(validate.to_states(cube)[0], moves, init.get_compact_turns(3))):
+            best = moves
+            status["optimal"] = len(best) == bound
+            yield best
+            if status["optimal"]:
+                return
+
+    try:
+        two_phase = TwoPhase(cube, deadline, check_interval)
+        for solution in two_phase.solutions(30 if best is None else len(best) - 1):
+            best = solution
+            status["optimal"] = len(best) == bound
+            yield best
+            if status["optimal"]:
+                return
+        if best is None:
+            return
+
+        # The two-phase search is exhausted, so no shorter solution goes through
+        # its intermediate group. Only IDA* can prove the best one optimal.
+        search = Search(deadline, check_interval, limit=len(best) - 1)
+        while bound < len(best):
+            path, bound = search.run(coords, bound)
+            if path is not None:
+                best = [cubie.move_names[move] for move in path]
+                status["optimal"] = True
+                yield best
+                return
+        # Every bound below the length of best is exhausted
+        status["optimal"] = True
+    except Cancelled:
+        return
+
+
+def solve_report(cube, time_budget=1.0, coords=None):
+    # {"solution": moves, "length": ..., "optimal": ...} of the best solution found within
+    # time_budget, or of the first one found after it. optimal is True only when proven.
+    status = {}
+    best = None
+    for best in solve_anytime(cube, time_budget, status=status, coords=coords):
+        pass
+    if best is None:
+        best = next(TwoPhase(cube).solutions())
+    return {"solution": best, "length": len(best), "optimal": status["optimal"]}
+
+
+def solve(cube, time_budget=1.0):
+    # Best solution found within time_budget, or the first one found after it
+    return solve_report(cube, time_budget)["solution"]
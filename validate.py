@@ -0,0 +1,115 @@
+from functools import lru_cache
+from itertools import permutations, product
+
+import numpy as np
+
+import cubie
+import init
+
+# Error flags of validate(), a state can have several of them
+OK = 0
+COLOR_COUNT = 1  # Not nine stickers of each center color
+CENTERS = 2  # Centers are not the color scheme of init.get_cube seen from some side
+CORNERS = 4  # Stickers that form no corner, or a corner twice
+EDGES = 8  # Stickers that form no edge, or an edge twice
+PARITY = 16  # Corner and edge permutations of different parity
+TWIST = 32  # Corner twists do not add up to a multiple of 3
+FLIP = 64  # Odd number of flipped edges
+
+# States validated at once
+CHUNK = 16384
+
+error_names = {COLOR_COUNT: "color count", CENTERS: "centers", CORNERS: "corners", EDGES: "edges",
+               PARITY: "parity", TWIST: "twist", FLIP: "flip"}
+
+
+@lru_cache(maxsize=None)
+def get_center_layouts():
+    # Center colors in compact side order for all 24 orientations of the solved cube
+    normals = np.array([init.side_frames[side][0] for side in init.compact_sides])
+    centers = init.to_compact(init.get_cube())[4::9]
+    layouts = []
+    for axes, signs in product(permutations(range(3)), product((1, -1), repeat=3)):
+        rotation = np.eye(3, dtype=int)[list(axes)] * np.array(signs)[:, None]
+        if round(np.linalg.det(rotation)) != 1:
+            continue
+        # Side i of the rotated cube shows the center that was on side new_side[i]
+        rotated = normals @ rotation.T
+        new_side = [int(np.flatnonzero((rotated == normal).all(axis=1))[0]) for normal in normals]
+        layouts.append(centers[new_side])
+    return np.array(layouts)
+
+
+def to_states(cubes):
+    # (N, 54) compact states of a compact state, an init net or a batch of either
+    cubes = np.asarray(cubes)
+    if cubes.shape[-2:] == (9, 12):
+        return cubes.reshape(-1, 108)[:, init.compact_idx]
+    if cubes.shape[-1] == 54:
+        return cubes.reshape(-1, 54)
+    raise ValueError(f"Expected 3x3x3 compact states or nets, got shape {cubes.shape}")
+
+
+def parity(perms):
+    # 0 for even and 1 for odd permutations, along the last axis
+    i, j = np.triu_indices(perms.shape[-1], 1)
+    return (perms[..., i] > perms[..., j]).sum(axis=-1) % 2
+
+
+def _validate_chunk(states):
+    errors = np.zeros(len(states), dtype=np.uint8)
+    centers = states[:, 4::9]
+    layouts = get_center_layouts() @ 6 ** np.arange(6)
+    in_scheme = ((centers >= 0) & (centers < 6)).all(axis=1)
+    errors[~(in_scheme & np.isin(centers @ 6 ** np.arange(6), layouts))] |= CENTERS
+
+    faces = cubie.sticker_faces(states)
+    cp, co, ep, eo = cubie.from_faces(faces)
+    corners_valid = (np.sort(cp, axis=1) == np.arange(8)).all(axis=1)
+    edges_valid = (np.sort(ep, axis=1) == np.arange(12)).all(axis=1)
+    errors[~corners_valid] |= CORNERS
+    errors[~edges_valid] |= EDGES
+
+    # A full set of corners and edges has nine stickers of every color,
+    # so only states with broken pieces need their colors counted
+    pieces_valid = corners_valid & edges_valid
+    broken = np.flatnonzero(~pieces_valid)
+    if broken.size:
+        # Stickers per face, colors that are no center color count for face -1
+        labels = faces[broken] + 1 + 7 * np.arange(broken.size)[:, None]
+        counts = np.bincount(labels.ravel(), minlength=7 * broken.size).reshape(-1, 7)
+        errors[broken[(counts[:, 1:] != 9).any(axis=1)]] |= COLOR_COUNT
+
+    errors[pieces_valid & (parity(cp) != parity(ep))] |= PARITY
+    errors[corners_valid & (co.sum(axis=1) % 3 != 0)] |= TWIST
+    errors[edges_valid & (eo.sum(axis=1) % 2 != 0)] |= FLIP
+    return errors
+
+
+def validate(cubes, chunk=CHUNK):
+    """Error flags of each state, OK (0) for states that can be solved.
+
+    Takes a compact state, an init net or a batch of either and returns a
+    uint8 array with one entry per state. Parity, twist and flip are only
+    checked for states whose stickers form valid corners and edges.
+    """
+    states = to_states(cubes)
+    # Chunks keep the temporary arrays in the CPU cache
+    return np.concatenate([_validate_chunk(states[start:start + chunk])
+                           for start in range(0, len(states), chunk)] or [np.zeros(0, dtype=np.uint8)])
+
+
+def is_valid(cubes):
+    return validate(cubes) == OK
+
+
+def describe(error):
+    # Names of the flags set in one error code
+    return [name for flag, name in error_names.items() if error & flag]
+
+
+def check(cube):
+    # Raises ValueError naming the errors of a single state
+    error = validate(cube)[0]
+    if error:
+        raise ValueError(f"Invalid cube state: {', '.join(describe(error))}")